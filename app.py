@@ -3,7 +3,9 @@ import sys
 import json
 import webview
 import threading
+import uuid
 import importlib
+import multiprocessing
 from flask import Flask, render_template, request, jsonify
 app = Flask(__name__)
 app.config['TEMPLATES_AUTO_RELOAD'] = False
@@ -30,6 +32,13 @@ else:
     print(f"SCRIPT MODE: Working directory: {script_dir}")
 
 from vcf_extractor import VCFProcessor
+from parse_cache import ParseCache
+from processed_log import open_log_store, compact_in_background
+from output_writers import DEFAULT_OUTPUT_FORMAT, output_format_error
+from output_transaction import recover_output_transactions
+from number_import import import_numbers
+from contact import Contact
+from phone_numbers import phone_defaults, DEFAULT_COUNTRY_CODE, DEFAULT_AREA_CODE
 import subprocess
 import configparser
 import json
@@ -60,6 +69,9 @@ app.template_folder = template_folder_path
 
 session_data = {}
 session_lock = threading.Lock()
+# Background imports of number lists by job id, polled through /import_status
+import_jobs = {}
+import_jobs_lock = threading.Lock()
 
 # Use AppData for user settings
 if getattr(sys, 'frozen', False):
@@ -72,10 +84,12 @@ else:
     application_path = os.path.dirname(os.path.abspath(__file__))
 
 LOG_FILENAME = os.path.join(application_path, "NAO_APAGAR.log")
+PARSE_CACHE_DIR = os.path.join(application_path, "parse_cache")
 
 def initialize_log_from_xlsx():
     """Initialize log from NAO_APAGAR.xlsx in Documents folder on first run"""
-    if os.path.exists(LOG_FILENAME) and os.path.getsize(LOG_FILENAME) > 0:
+    processed_log = open_processed_log()
+    if processed_log:
         return
     
     docs_path = os.path.expanduser("~/Documents")
@@ -85,26 +99,7 @@ def initialize_log_from_xlsx():
         return
     
     try:
-        import pandas as pd
-        df = pd.read_excel(xlsx_path)
-        
-        phone_columns = [col for col in df.columns if 'phone' in col.lower() or 'telefone' in col.lower() or 'numero' in col.lower()]
-        
-        if not phone_columns:
-            phone_columns = [df.columns[0]]
-        
-        numbers = set()
-        for col in phone_columns:
-            for value in df[col].dropna():
-                digits = ''.join(filter(str.isdigit, str(value)))
-                if len(digits) >= 8:
-                    numbers.add(int(digits))
-        
-        with open(LOG_FILENAME, 'w', encoding='utf-8') as f:
-            for number in sorted(numbers):
-                f.write(f"{number}\n")
-        
-        logging.info(f"Initialized log with {len(numbers)} numbers from {xlsx_path}")
+        import_numbers(xlsx_path, processed_log)
     except Exception as e:
         logging.error(f"Failed to initialize log from xlsx: {e}")
 
@@ -117,6 +112,26 @@ initial_data_for_ui = {
 def create_default_config(config_path):
     default_config = '''[Settings]
 light_mode = follow
+# Processes used to parse large VCF files; 1 parses in this process, 0 uses one per CPU core
+parse_workers = 1
+# Disk space for cached parse results of recently processed VCF files; 0 disables the cache
+parse_cache_max_mb = 256
+# Only parse cards appended since the last saved run of the same VCF file
+incremental = false
+# Where processed numbers are kept: text (NAO_APAGAR.log) or sqlite (indexed, migrated from the text log)
+log_backend = text
+# False-positive rate of a Bloom filter kept in front of the processed log (e.g. 0.01), so new numbers skip the log; 0 disables it
+bloom_fp_rate = 0
+# Output file format: xlsx, csv, parquet (needs pyarrow) or vcf
+output_format = xlsx
+# Split outputs into numbered part files of at most this many contacts, plus a manifest; 0 keeps one file
+max_rows_per_file = 0
+# Also pack the part files and manifest into one zip
+zip_parts = false
+# Country and area code given to numbers written without them; numbers starting with + or 00 keep their own.
+# Numbers are matched against the log in E.164 form
+default_country_code = 55
+default_area_code = 11
 
 [Titles]
 titles_to_remove = [
@@ -131,7 +146,7 @@ titles_to_remove = [
     except Exception as e:
         logging.error(f"Failed to create config: {e}")
 
-def read_config_ini():
+def find_config_ini_path():
     if getattr(sys, 'frozen', False):
         appdata_path = os.path.expanduser("~/AppData/Local/VCF_PROCESSOR")
         config_paths = [os.path.join(appdata_path, 'config.ini'), os.path.join(sys._MEIPASS, 'config.ini'), config_ini_path]
@@ -148,12 +163,10 @@ def read_config_ini():
         else:
             config_ini_path_used = config_ini_path
         create_default_config(config_ini_path_used)
-        
-    if not os.path.exists(config_ini_path_used):
-        return 'static', []
-        
+    return config_ini_path_used
+
+def parse_settings_lines(lines):
     config = configparser.ConfigParser(allow_no_value=True)
-    with open(config_ini_path_used, encoding='utf-8') as f: lines = f.readlines()
     filtered_lines, in_titles, current_section = [], False, None
     for line in lines:
         stripped = line.strip()
@@ -171,7 +184,9 @@ def read_config_ini():
         elif not in_titles:
             filtered_lines.append(line)
     config.read_string(''.join(filtered_lines))
-    light_mode = config.get('Settings', 'light_mode', fallback='static')
+    return config
+
+def parse_titles_lines(lines):
     titles_lines, in_titles = [], False
     for line in lines:
         stripped = line.strip()
@@ -189,11 +204,95 @@ def read_config_ini():
                 if clean_line:
                     titles_lines.append(clean_line)
     titles_str = '[' + ','.join(f'"{line}"' for line in titles_lines) + ']'
-    try: titles = json.loads(titles_str)
+    try: return json.loads(titles_str)
     except Exception:
-        try: titles = ast.literal_eval(titles_str)
-        except Exception: titles = []
-    return light_mode, titles
+        try: return ast.literal_eval(titles_str)
+        except Exception: return []
+
+_config_snapshot = {}
+_config_lock = threading.Lock()
+
+def load_config_snapshot():
+    """Parsed settings and titles, re-read only when config.ini changes on disk."""
+    config_ini_path_used = find_config_ini_path()
+    try:
+        stat = os.stat(config_ini_path_used)
+    except FileNotFoundError:
+        return None
+    stamp = (config_ini_path_used, stat.st_mtime_ns, stat.st_size)
+    with _config_lock:
+        if _config_snapshot.get('stamp') != stamp:
+            with open(config_ini_path_used, encoding='utf-8') as f: lines = f.readlines()
+            _config_snapshot.update(stamp=stamp, config=parse_settings_lines(lines), titles=parse_titles_lines(lines))
+        return _config_snapshot['config'], _config_snapshot['titles']
+
+def clear_config_snapshot():
+    with _config_lock:
+        _config_snapshot.clear()
+
+def read_setting(option, fallback=None, cast=str):
+    snapshot = load_config_snapshot()
+    if snapshot is None:
+        return fallback
+    value = snapshot[0].get('Settings', option, fallback=None)
+    if value is None:
+        return fallback
+    try: return cast(value)
+    except ValueError:
+        logging.warning(f"Invalid value for setting '{option}': {value!r}")
+        return fallback
+
+def setting_flag(value):
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+def open_processed_log():
+    return open_log_store(LOG_FILENAME, read_setting('log_backend', 'text'), read_setting('bloom_fp_rate', 0, float),
+                          *phone_defaults(read_setting('default_country_code', DEFAULT_COUNTRY_CODE),
+                                          read_setting('default_area_code', DEFAULT_AREA_CODE)))
+
+def build_parse_cache():
+    max_mb = read_setting('parse_cache_max_mb', 256, int)
+    return ParseCache(PARSE_CACHE_DIR, max_bytes=max_mb * 1024 * 1024) if max_mb > 0 else None
+
+def read_config_ini():
+    snapshot = load_config_snapshot()
+    if snapshot is None:
+        return 'static', []
+    config, titles = snapshot
+    # Callers sort and keep the list, so they get a copy of the cached one
+    return config.get('Settings', 'light_mode', fallback='static'), list(titles)
+
+def requested_output_format(data=None):
+    """Output format asked for in the request body, else the one set in config.ini."""
+    output_format = (data or {}).get('output_format') or read_setting('output_format', DEFAULT_OUTPUT_FORMAT)
+    return str(output_format).strip().lower()
+
+def requested_split_options(data=None):
+    """max_rows_per_file and bundle for process_and_save, from the request body or config.ini."""
+    data = data or {}
+    max_rows = data.get('max_rows_per_file')
+    if max_rows is None:
+        max_rows = read_setting('max_rows_per_file', 0, int)
+    bundle = data.get('zip_parts')
+    if bundle is None:
+        bundle = read_setting('zip_parts', False, setting_flag)
+    try: max_rows = max(int(max_rows), 0)
+    except (TypeError, ValueError):
+        logging.warning(f"Invalid max_rows_per_file: {max_rows!r}")
+        max_rows = 0
+    return {'max_rows_per_file': max_rows, 'bundle': bool(bundle)}
+
+def build_processor(with_file_options=True):
+    """VCFProcessor for the current config; the log index and title regex behind it are shared across requests."""
+    global TITLES_TO_REMOVE
+    _, TITLES_TO_REMOVE = read_config_ini()
+    options = {'log_backend': read_setting('log_backend', 'text'), 'bloom_fp_rate': read_setting('bloom_fp_rate', 0, float),
+               'country_code': read_setting('default_country_code', DEFAULT_COUNTRY_CODE),
+               'area_code': read_setting('default_area_code', DEFAULT_AREA_CODE)}
+    if with_file_options:
+        options.update(parse_workers=read_setting('parse_workers', 1, int), parse_cache=build_parse_cache(),
+                       incremental=read_setting('incremental', False, setting_flag))
+    return VCFProcessor(log_file_path=LOG_FILENAME, titles_to_remove=TITLES_TO_REMOVE, **options)
 
 LIGHT_MODE_DEFAULT, TITLES_TO_REMOVE = read_config_ini()
 
@@ -297,7 +396,7 @@ class Api:
             self._window.resize(self.initial_width, self.initial_height)
 
     def open_log_file_with_notepad(self):
-        subprocess.run(["notepad.exe", LOG_FILENAME], check=True)
+        subprocess.run(["notepad.exe", open_processed_log().as_text_file()], check=True)
 
     def open_file_path(self, path):
         if not os.path.exists(path):
@@ -319,14 +418,35 @@ class Api:
 
 api = Api()
 
+def parse_command_line(args):
+    """Returns (VCF path or None, output format, split options, import path or None) from
+    `app.py [file.vcf] [--format xlsx|csv|parquet|vcf] [--max-rows N] [--zip] [--import numbers.xlsx|csv]`."""
+    initial_file_path, options, args = None, {}, list(args)
+    while args:
+        arg = args.pop(0)
+        if arg in ('--format', '--max-rows', '--import') and args:
+            options[arg] = args.pop(0)
+        elif arg.startswith(('--format=', '--max-rows=', '--import=')):
+            name, value = arg.split('=', 1)
+            options[name] = value
+        elif arg == '--zip':
+            options['--zip'] = True
+        elif not arg.startswith('-') and initial_file_path is None and os.path.exists(arg):
+            initial_file_path = arg
+    output_format = requested_output_format({'output_format': options.get('--format')})
+    split_options = requested_split_options({'max_rows_per_file': options.get('--max-rows'),
+                                             'zip_parts': options.get('--zip')})
+    return initial_file_path, output_format, split_options, options.get('--import')
+
 # --- Centralized Processing Logic ---
-def process_vcf_file_logic(vcf_path):
+def process_vcf_file_logic(vcf_path, output_format=DEFAULT_OUTPUT_FORMAT, split_options=None):
     if not vcf_path or not os.path.isfile(vcf_path):
         return jsonify({"error": "Caminho do arquivo VCF é inválido ou não encontrado."}), 400
+    format_error = output_format_error(output_format)
+    if format_error:
+        return jsonify({"error": f"Formato de saída indisponível: {format_error}"}), 400
     try:
-        global TITLES_TO_REMOVE
-        _, TITLES_TO_REMOVE = read_config_ini()
-        processor = VCFProcessor(log_file_path=LOG_FILENAME, titles_to_remove=TITLES_TO_REMOVE)
+        processor = build_processor()
         unique_contacts, duplicate_contacts = processor.get_unique_and_duplicate_contacts(vcf_path)
         
         if not duplicate_contacts:
@@ -334,18 +454,25 @@ def process_vcf_file_logic(vcf_path):
             abs_vcf_path = os.path.abspath(vcf_path)
             output_dir = os.path.dirname(abs_vcf_path)
             base_name = os.path.splitext(os.path.basename(abs_vcf_path))[0]
-            output_file = processor.process_and_save(unique_contacts, output_dir, base_name)
+            output_file = processor.process_and_save(unique_contacts, output_dir, base_name, source=abs_vcf_path,
+                                                     output_format=output_format, **(split_options or {}))
             return jsonify({
                 "message": "Processamento concluído. Nenhuma duplicata encontrada.",
-                "output_file": output_file or "None", "duplicates": []
+                "output_file": output_file or "None", "duplicates": [], "run_id": processor.last_run_id,
+                "encoding": processor.parse_stats.get('encoding'),
+                "skipped_bytes": processor.parse_stats.get('skipped_bytes', 0)
             })
         else:
             with session_lock:
                 session_data['processor'] = processor
                 session_data['vcf_path'] = vcf_path
                 session_data['unique_contacts'] = unique_contacts
+                session_data['output_format'] = output_format
+                session_data['split_options'] = split_options or {}
                 session_data.pop('output_base_name', None)
-            return jsonify({"duplicates": duplicate_contacts})
+            return jsonify({"duplicates": [contact.to_dict() for contact in duplicate_contacts],
+                            "encoding": processor.parse_stats.get('encoding'),
+                            "skipped_bytes": processor.parse_stats.get('skipped_bytes', 0)})
     except Exception as e:
         logging.error(f"Erro ao processar o arquivo VCF: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -373,6 +500,7 @@ def save_light_mode():
                     if line.strip() == '[Settings]':
                         lines.insert(i+1, f'light_mode = {light_mode}\n'); break
             with open(config_ini_path, 'w', encoding='utf-8') as f: f.writelines(lines)
+            clear_config_snapshot()
         except Exception as e:
             logger.error(f"Error saving light mode: {e}")
             return jsonify({'status': 'error', 'message': str(e)}), 500
@@ -419,6 +547,7 @@ def save_titles():
         else:
             lines.extend(new_titles_lines)
         with open(config_ini_path, 'w', encoding='utf-8') as f: f.writelines(lines)
+        clear_config_snapshot()
         return jsonify({"status": "success"}), 200
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -426,8 +555,7 @@ def save_titles():
 @app.route('/get_processed_numbers', methods=['GET'])
 def get_processed_numbers():
     try:
-        with open(LOG_FILENAME, 'r', encoding='utf-8') as f: lines = f.readlines()
-        processed_numbers = [int(line.strip()) for line in lines if line.strip().isdigit()]
+        processed_numbers = list(open_processed_log())
         return jsonify({"numbers": processed_numbers}), 200
     except FileNotFoundError: return jsonify({"error": "Log file not found."}), 404
     except Exception as e: return jsonify({"error": str(e)}), 500
@@ -440,8 +568,7 @@ def add_processed_numbers():
     if not isinstance(numbers_to_add, list) or not all(isinstance(num, int) for num in numbers_to_add):
         return jsonify({"error": "Invalid input format. Expected a list of integers."}), 400
     try:
-        with open(LOG_FILENAME, 'a', encoding='utf-8') as f:
-            for number in numbers_to_add: f.write(f"{number}\n")
+        open_processed_log().add_many(numbers_to_add)
         return jsonify({"status": "success"}), 200
     except Exception as e: return jsonify({"error": str(e)}), 500
 
@@ -453,13 +580,57 @@ def remove_processed_numbers():
     if not isinstance(numbers_to_remove, list) or not all(isinstance(num, int) for num in numbers_to_remove):
         return jsonify({"error": "Invalid input format. Expected a list of integers."}), 400
     try:
-        with open(LOG_FILENAME, 'r', encoding='utf-8') as f: lines = f.readlines()
-        with open(LOG_FILENAME, 'w', encoding='utf-8') as f:
-            for line in lines:
-                if line.strip() not in map(str, numbers_to_remove): f.write(line)
+        open_processed_log().remove_many(numbers_to_remove)
         return jsonify({"status": "success"}), 200
     except Exception as e: return jsonify({"error": str(e)}), 500
 
+def run_import_job(job_id, path):
+    def update(status):
+        with import_jobs_lock:
+            import_jobs[job_id].update(status)
+    try:
+        update(import_numbers(path, open_processed_log(), on_progress=update))
+        update({'state': 'done'})
+    except Exception as e:
+        logging.error(f"Erro ao importar números de {path}: {e}", exc_info=True)
+        update({'state': 'error', 'error': str(e)})
+
+@app.route('/import_numbers', methods=['POST'])
+def import_numbers_route():
+    data = request.get_json()
+    path = (data or {}).get('path')
+    if not path or not os.path.isfile(path):
+        return jsonify({"error": "Caminho do arquivo de números é inválido ou não encontrado."}), 400
+    job_id = uuid.uuid4().hex[:8]
+    with import_jobs_lock:
+        import_jobs[job_id] = {'state': 'running', 'path': path, 'rows': 0, 'found': 0, 'added': 0, 'fraction': 0.0}
+    threading.Thread(target=run_import_job, args=(job_id, path), daemon=True).start()
+    return jsonify({"job_id": job_id}), 202
+
+@app.route('/import_status/<job_id>', methods=['GET'])
+def import_status(job_id):
+    with import_jobs_lock:
+        job = import_jobs.get(job_id)
+        if job is None: return jsonify({"error": "Import job not found."}), 404
+        return jsonify(dict(job)), 200
+
+@app.route('/list_runs', methods=['GET'])
+def list_runs():
+    try:
+        return jsonify({"runs": open_processed_log().list_runs()}), 200
+    except Exception as e: return jsonify({"error": str(e)}), 500
+
+@app.route('/rollback_run', methods=['POST'])
+def rollback_run():
+    data = request.get_json()
+    if not data or not isinstance(data.get('run_id'), str): return jsonify({"error": "No run_id provided."}), 400
+    try:
+        run = open_processed_log().rollback_run(data['run_id'])
+        if run is None:
+            return jsonify({"error": "Run not found or already rolled back."}), 404
+        return jsonify({"status": "success", "run": run}), 200
+    except Exception as e: return jsonify({"error": str(e)}), 500
+
 @app.route('/get_session_data', methods=['GET'])
 def get_session_data():
     with session_lock:
@@ -468,41 +639,47 @@ def get_session_data():
 
 @app.route('/start_vcf_processing', methods=['POST'])
 def start_vcf_processing():
-    vcf_path = request.get_json().get('vcf_path')
-    return process_vcf_file_logic(vcf_path)
+    data = request.get_json()
+    return process_vcf_file_logic(data.get('vcf_path'), requested_output_format(data), requested_split_options(data))
 
 @app.route('/process_dropped_vcf', methods=['POST'])
 def process_dropped_vcf():
-    vcf_path = request.get_json().get('vcf_path')
-    return process_vcf_file_logic(vcf_path)
+    data = request.get_json()
+    return process_vcf_file_logic(data.get('vcf_path'), requested_output_format(data), requested_split_options(data))
 
 @app.route('/start_text_processing', methods=['POST'])
 def start_text_processing():
-    text_content = request.get_json().get('text_content')
+    data = request.get_json()
+    text_content = data.get('text_content')
     if not text_content or not text_content.strip():
         return jsonify({"error": "Nenhum texto fornecido."}), 400
+    output_format, split_options = requested_output_format(data), requested_split_options(data)
+    format_error = output_format_error(output_format)
+    if format_error:
+        return jsonify({"error": f"Formato de saída indisponível: {format_error}"}), 400
     try:
-        global TITLES_TO_REMOVE
-        _, TITLES_TO_REMOVE = read_config_ini()
-        processor = VCFProcessor(log_file_path=LOG_FILENAME, titles_to_remove=TITLES_TO_REMOVE)
+        processor = build_processor(with_file_options=False)
         unique_contacts, duplicate_contacts = processor.get_unique_and_duplicate_contacts_from_text(text_content)
         
         if not duplicate_contacts:
             logging.info("Nenhuma duplicata encontrada no texto. Processando automaticamente.")
             output_dir = os.path.expanduser("~/Documents")
             base_name = "Contatos_Colados"
-            output_file = processor.process_and_save(unique_contacts, output_dir, base_name)
+            output_file = processor.process_and_save(unique_contacts, output_dir, base_name, source="Texto colado",
+                                                     output_format=output_format, **split_options)
             return jsonify({
                 "message": "Processamento de texto concluído.",
-                "output_file": output_file or "None", "duplicates": []
+                "output_file": output_file or "None", "duplicates": [], "run_id": processor.last_run_id
             })
         else:
             with session_lock:
                 session_data['processor'] = processor
                 session_data['unique_contacts'] = unique_contacts
                 session_data['output_base_name'] = "Contatos_Colados"
+                session_data['output_format'] = output_format
+                session_data['split_options'] = split_options
                 session_data.pop('vcf_path', None)
-            return jsonify({"duplicates": duplicate_contacts})
+            return jsonify({"duplicates": [contact.to_dict() for contact in duplicate_contacts]})
     except Exception as e:
         logging.error(f"Erro ao processar texto: {e}", exc_info=True)
         return jsonify({"error": str(e)}), 500
@@ -510,17 +687,23 @@ def start_text_processing():
 @app.route('/reprocess_selected', methods=['POST'])
 def reprocess_selected():
     data = request.get_json()
-    selected_to_reprocess = data.get('selected_to_reprocess', [])
+    # The UI sends contacts back as the dicts it was given
+    selected_to_reprocess = [Contact.from_dict(contact) for contact in data.get('selected_to_reprocess', [])]
     logging.info(f"Reprocessing {len(selected_to_reprocess)} selected contacts")
     with session_lock:
         processor = session_data.get('processor')
         vcf_path = session_data.get('vcf_path')
         output_base_name = session_data.get('output_base_name')
         unique_contacts = session_data.get('unique_contacts', [])
+        output_format = data.get('output_format') or session_data.get('output_format') or requested_output_format()
+        split_options = session_data.get('split_options') or requested_split_options()
     if not processor:
         return jsonify({"error": "Session expired. Please start over."}), 400
+    format_error = output_format_error(output_format)
+    if format_error:
+        return jsonify({"error": f"Formato de saída indisponível: {format_error}"}), 400
     try:
-        numbers_to_remove = [contact['cleaned_number'] for contact in selected_to_reprocess]
+        numbers_to_remove = [contact.cleaned_number for contact in selected_to_reprocess]
         if numbers_to_remove:
             processor.remove_from_log(numbers_to_remove)
         contacts_to_process = unique_contacts + selected_to_reprocess
@@ -533,13 +716,15 @@ def reprocess_selected():
             output_dir = os.path.expanduser("~/Documents")
             base_name = output_base_name
         
-        output_file = processor.process_and_save(contacts_to_process, output_dir, base_name)
+        output_file = processor.process_and_save(contacts_to_process, output_dir, base_name,
+                                                 source=os.path.abspath(vcf_path) if vcf_path else "Texto colado",
+                                                 output_format=output_format, **split_options)
         
         with session_lock:
             session_data.clear()
         return jsonify({
             "message": "Processing complete!" if output_file else "Processing failed!",
-            "output_file": output_file or "None"
+            "output_file": output_file or "None", "run_id": processor.last_run_id
         })
     except Exception as e:
         logging.error(f"Error during reprocessing: {e}", exc_info=True)
@@ -554,33 +739,57 @@ def shutdown():
 
 # --- Main Execution Block ---
 if __name__ == '__main__':
+    # Parse workers of a frozen build re-launch this exe; let them run their task and exit
+    multiprocessing.freeze_support()
     initialize_log_from_xlsx()
-    initial_file_path = None
-    if len(sys.argv) > 1 and os.path.exists(sys.argv[1]) and not sys.argv[1].startswith('-'):
-         initial_file_path = sys.argv[1]
+    # Finish or undo saves that a crash cut short before anything new is written
+    recover_output_transactions(open_processed_log())
+    # Fold removals recorded as tombstones into the log without delaying startup
+    compact_in_background(open_processed_log())
+    initial_file_path, output_format, split_options, import_path = parse_command_line(sys.argv[1:])
+    if import_path:
+        def print_progress(status):
+            fraction = f"{status['fraction']:.0%}" if status['fraction'] is not None else '?'
+            print(f"\r{fraction} {status['rows']} rows, {status['added']} new numbers", end='', flush=True)
+        try:
+            status = import_numbers(import_path, open_processed_log(), on_progress=print_progress)
+            print(f"\nImported {status['added']} new of {status['found']} numbers from {import_path}")
+            sys.exit(0)
+        except Exception as e:
+            print(f"\nImport failed: {e}")
+            sys.exit(1)
 
     headless_mode_successful = False
+    format_error = output_format_error(output_format)
+    if initial_file_path and format_error:
+        print(f"{format_error}; falling back to {DEFAULT_OUTPUT_FORMAT}")
+        output_format = DEFAULT_OUTPUT_FORMAT
     if initial_file_path:
         print("--- Running in Headless Mode ---")
         try:
-            processor = VCFProcessor(log_file_path=LOG_FILENAME, titles_to_remove=TITLES_TO_REMOVE)
+            processor = build_processor()
             unique_contacts, duplicate_contacts = processor.get_unique_and_duplicate_contacts(initial_file_path)
+            print(f"Detected encoding: {processor.parse_stats.get('encoding')}, "
+                  f"skipped {processor.parse_stats.get('skipped_bytes', 0)} bytes of embedded binary data")
             if not duplicate_contacts:
                 print("No duplicates found. Processing unique contacts automatically.")
                 abs_input_path = os.path.abspath(initial_file_path)
                 output_dir = os.path.dirname(abs_input_path)
                 base_name = os.path.splitext(os.path.basename(abs_input_path))[0]
-                output_file = processor.process_and_save(unique_contacts, output_dir, base_name)
-                logging.info(f"Headless processing complete. Output: {output_file or 'None'}")
+                output_file = processor.process_and_save(unique_contacts, output_dir, base_name, source=abs_input_path,
+                                                         output_format=output_format, **split_options)
+                logging.info(f"Headless processing complete. Output: {output_file or 'None'} (run {processor.last_run_id})")
                 headless_mode_successful = True
             else:
                 print(f"Found {len(duplicate_contacts)} duplicates. Preparing data for GUI...")
                 initial_data_for_ui['vcf_path'] = initial_file_path
-                initial_data_for_ui['duplicates'] = duplicate_contacts
+                initial_data_for_ui['duplicates'] = [contact.to_dict() for contact in duplicate_contacts]
                 with session_lock:
                     session_data['processor'] = processor
                     session_data['vcf_path'] = initial_file_path
                     session_data['unique_contacts'] = unique_contacts
+                    session_data['output_format'] = output_format
+                    session_data['split_options'] = split_options
         except Exception as e:
              logging.error(f"An error occurred during initial headless processing: {e}", exc_info=True)
              initial_data_for_ui['vcf_path'] = initial_file_path
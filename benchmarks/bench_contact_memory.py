@@ -0,0 +1,75 @@
+"""Memory of normalized contacts as dicts grouped per number, as parsing used to hold them, against Contact
+records with groups only for repeated numbers, as _sort_normalized_contacts does now.
+
+Builds and groups the same contacts both ways under tracemalloc and prints the retained and peak bytes per
+contact, strings included, since a parse creates those along with the records.
+Usage: python benchmarks/bench_contact_memory.py [contacts]
+"""
+import sys
+import time
+import random
+import tracemalloc
+from fixtures import FIRST_NAMES, LAST_NAMES, random_number
+from contact import Contact, CONTACT_FIELDS
+
+
+def dict_record(*fields):
+    return dict(zip(CONTACT_FIELDS, fields))
+
+
+def group_every_number(records):
+    groups = {}
+    for record in records:
+        groups.setdefault(record['cleaned_number'], []).append(record)
+    return groups
+
+
+def group_repeated_numbers(records):
+    first_by_number, repeated = {}, {}
+    for record in records:
+        first = first_by_number.setdefault(record.cleaned_number, record)
+        if first is not record:
+            repeated.setdefault(record.cleaned_number, [first]).append(record)
+    return first_by_number, repeated
+
+
+def build(make_record, names, numbers):
+    records = []
+    for name, number in zip(names, numbers):
+        # Fresh strings per contact, like the parser's
+        original_name, cleaned_number = (name + ' ')[:-1], (number + ' ')[:-1]
+        formatted = f"+{cleaned_number[:2]} {cleaned_number[2:4]} {cleaned_number[4:9]}-{cleaned_number[9:]}"
+        records.append(make_record(original_name, formatted, cleaned_number, original_name.upper()))
+    return records
+
+
+def measure(make_record, group, names, numbers):
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = build(make_record, names, numbers)
+    built = tracemalloc.get_traced_memory()[0]
+    groups = group(records)
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del records, groups
+    return built, retained, peak, elapsed
+
+
+def main():
+    contacts = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    rng = random.Random(0)
+    names = [f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}" for i in range(contacts)]
+    # About 10% of the cards repeat a number seen earlier
+    numbers = [random_number(rng) for _ in range(contacts)]
+    numbers = [numbers[rng.randrange(i)] if i and rng.random() < 0.1 else number for i, number in enumerate(numbers)]
+    print(f"{contacts} contacts, {len(set(numbers))} distinct numbers")
+    for label, make_record, group in (("dict", dict_record, group_every_number),
+                                      ("Contact", Contact, group_repeated_numbers)):
+        built, retained, peak, elapsed = measure(make_record, group, names, numbers)
+        print(f"  {label:8} records {built / contacts:.0f} B/contact, with groups {retained / contacts:.0f} B/contact, "
+              f"peak {peak / contacts:.0f} B/contact ({elapsed:.2f} s traced)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""Processed-numbers log held as a set of str (the old TextLogStore) against the SortedNumberIndex.
+
+Usage: python benchmarks/bench_log_index.py [log numbers] [lookups]
+"""
+import sys
+import time
+import random
+import logging
+import tempfile
+import tracemalloc
+from fixtures import log_numbers
+from processed_log import TextLogStore
+
+
+def measured(load):
+    """(loaded numbers, load time, bytes held); memory is traced on a second load, as tracing slows it down."""
+    start = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    numbers = load()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return numbers, elapsed, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    lookups = int(sys.argv[2]) if len(sys.argv) > 2 else 400_000
+    logging.disable(logging.INFO)
+    logged = log_numbers(count)
+    rng = random.Random(3)
+    # Half of the candidates are already logged, as when a contact list is processed again
+    candidates = rng.sample(logged, lookups // 2) + log_numbers(lookups - lookups // 2, seed=4)
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/NAO_APAGAR.log"
+        with open(path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{number}\n" for number in logged)
+
+        def load_set():
+            with open(path, 'r', encoding='utf-8') as f:
+                return {line.strip() for line in f if line.strip().isdigit()}
+
+        strings, set_load, set_size = measured(load_set)
+        start = time.perf_counter()
+        set_found = {number for number in candidates if number in strings}
+        set_lookup = time.perf_counter() - start
+        del strings
+        index, index_load, index_size = measured(lambda: TextLogStore(path)._loaded())
+        start = time.perf_counter()
+        index_found = index.contains_many(candidates)
+        index_lookup = time.perf_counter() - start
+    print(f"{count} logged numbers, {lookups} lookups, same result: {set_found == index_found}")
+    print(f"  set of str:  {set_load:.2f} s load, {set_size / count:.0f} B/number, {set_lookup:.2f} s lookup")
+    print(f"  int64 index: {index_load:.2f} s load, {index_size / count:.1f} B/number, {index_lookup:.2f} s lookup")
+
+
+if __name__ == '__main__':
+    main()
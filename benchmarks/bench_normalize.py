@@ -0,0 +1,44 @@
+"""VCFProcessor.normalize_columns against the per-row _clean_name/_clean_phone_number it batches.
+
+Checks that both give the same columns and prints rows per second.
+Usage: python benchmarks/bench_normalize.py [rows]
+"""
+import sys
+import time
+import random
+import logging
+import tempfile
+from fixtures import default_titles, FIRST_NAMES, LAST_NAMES
+import vcf_extractor
+from vcf_extractor import VCFProcessor
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    logging.disable(logging.INFO)
+    rng = random.Random(0)
+    # Group exports repeat a limited set of names; a few rows are missing or odd
+    pool = FIRST_NAMES + [f"Nome{i}" for i in range(30_000)]
+    names = [None if rng.random() < 0.01 else f"{rng.choice(pool)} {rng.choice(LAST_NAMES)}" for _ in range(rows)]
+    numbers = [rng.choice([None, '', f"{rng.randrange(10 ** 12)}", '٣٤' + str(rng.randrange(100))]) if rng.random() < 0.02
+               else f"+55 (11) 9{rng.randrange(10 ** 8):08d}" for _ in range(rows)]
+    with tempfile.TemporaryDirectory() as directory:
+        processor = VCFProcessor(f"{directory}/NAO_APAGAR.log", titles_to_remove=default_titles())
+        start = time.perf_counter()
+        expected = [processor._clean_name(name) for name in names], [processor._clean_phone_number(n) for n in numbers]
+        per_row = time.perf_counter() - start
+        # Starts from an empty memo, like the per-row pass did
+        processor.title_matcher._memo.clear()
+        start = time.perf_counter()
+        columns = processor.normalize_columns(names, numbers)
+        batch = time.perf_counter() - start
+        start = time.perf_counter()
+        vcf_extractor._digits_only(numbers)
+        digits = time.perf_counter() - start
+    print(f"{rows} rows, same output: {columns == expected}")
+    print(f"  per row: {per_row:.2f} s ({rows / per_row / 1e6:.2f}M rows/s)")
+    print(f"  batch:   {batch:.2f} s ({rows / batch / 1e6:.2f}M rows/s), of which {digits:.2f} s filtering digits")
+
+
+if __name__ == '__main__':
+    main()
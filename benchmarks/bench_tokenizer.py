@@ -0,0 +1,59 @@
+"""Property tokenizer against the per-block regex cascade it replaced (_extract_contact_data).
+
+Usage: python benchmarks/bench_tokenizer.py [cards] [--photos]
+"""
+import re
+import sys
+import time
+import logging
+import tempfile
+from fixtures import write_vcf
+from vcf_extractor import VCFProcessor
+
+
+def regex_cascade(vcf_content):
+    """The old _extract_contact_data: up to 3 name searches and 4 number findall scans per block."""
+    contacts = []
+    for block in vcf_content.replace('\r\n', '\n').replace('\r', '\n').split("BEGIN:VCARD"):
+        if "END:VCARD" not in block:
+            continue
+        name, number = None, None
+        for pattern in [r'FN:(.+?)(?:\n|\r|$)', r'N:([^;\n\r]+)', r'NICKNAME:(.+?)(?:\n|\r|$)']:
+            match = re.search(pattern, block, re.MULTILINE)
+            if match:
+                name = match.group(1).strip()
+                break
+        for pattern in [r'TEL[^:]*:([+]?\d[\d\s\-\(\)]+)', r'waid=([^:;\s]+)', r'PHONE[^:]*:([+]?\d[\d\s\-\(\)]+)',
+                        r'X-WA-BIZ-NAME[^:]*:.*?([+]?\d{10,15})']:
+            for match in re.findall(pattern, block, re.MULTILINE | re.IGNORECASE):
+                cleaned = re.sub(r'[^\d+]', '', match)
+                if len(cleaned) >= 10:
+                    number = cleaned
+                    break
+            if number:
+                break
+        if name and number:
+            contacts.append({'name': name, 'number': number})
+    return contacts
+
+
+def main():
+    cards = int(sys.argv[1]) if len(sys.argv) > 1 and sys.argv[1].isdigit() else 200_000
+    logging.disable(logging.INFO)
+    with tempfile.TemporaryDirectory() as directory:
+        # Read back as the app gets it: decoded, with universal newlines
+        with open(write_vcf(f"{directory}/contacts.vcf", cards, photos='--photos' in sys.argv), encoding='utf-8') as f:
+            content = f.read()
+        processor = VCFProcessor(f"{directory}/NAO_APAGAR.log", titles_to_remove=[])
+        start = time.perf_counter()
+        expected = regex_cascade(content)
+        cascade = time.perf_counter() - start
+        start = time.perf_counter()
+        contacts = processor._extract_contact_data(content)
+        tokenizer = time.perf_counter() - start
+    print(f"{cards} cards, {len(content.encode('utf-8')) / 1e6:.0f} MB: cascade {cascade:.2f} s, "
+          f"tokenizer {tokenizer:.2f} s ({cascade / tokenizer:.1f}x), same output: {contacts == expected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Streaming xlsx writer (output_writers.write_xlsx) against the DataFrame.to_excel path it replaced.
+
+Each mode runs in its own process; peak RSS growth is measured after the contacts are built (Unix only).
+Usage: python benchmarks/bench_xlsx.py [rows ...]
+"""
+import os
+import sys
+import time
+import random
+import logging
+import tempfile
+import subprocess
+from fixtures import FIRST_NAMES, LAST_NAMES
+from contact import Contact
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def peak_rss_mb():
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 if resource else float('nan')
+
+
+def run(mode, rows, output_path):
+    import pandas as pd
+    from vcf_extractor import VCFProcessor
+    from output_writers import write_xlsx
+    logging.disable(logging.INFO)
+    rng = random.Random(1)
+    contacts = [Contact(f"Dr. {rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}", '', str(5511900000000 + i), None)
+                for i in range(rows)]
+    processor = VCFProcessor(os.devnull, titles_to_remove=['Dr'])
+    base = peak_rss_mb()
+    start = time.perf_counter()
+    if mode == 'dataframe':
+        frame = pd.DataFrame([{'Number': int(contact.cleaned_number), 'Name': processor._clean_name(contact.original_name)}
+                              for contact in contacts])
+        frame.to_excel(output_path, index=False, engine='openpyxl')
+    else:
+        write_xlsx(output_path, processor._output_rows(contacts))
+    elapsed = time.perf_counter() - start
+    print(f"{elapsed:.2f} s, +{peak_rss_mb() - base:.0f} MB")
+
+
+def main():
+    if len(sys.argv) == 5 and sys.argv[1] == '--run':
+        return run(sys.argv[2], int(sys.argv[3]), sys.argv[4])
+    sizes = [int(arg) for arg in sys.argv[1:]] or [100_000, 300_000]
+    print("| Rows | DataFrame.to_excel | write_xlsx |")
+    print("|------|--------------------|------------|")
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            results = [subprocess.run([sys.executable, __file__, '--run', mode, str(rows), f"{directory}/{mode}.xlsx"],
+                                      capture_output=True, text=True, check=True).stdout.strip()
+                       for mode in ('dataframe', 'streaming')]
+            print(f"| {rows // 1000}k | {results[0]} | {results[1]} |")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+import os
+import ast
+import sys
+import random
+import base64
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Benchmarks import the app's modules from the repository root
+sys.path.insert(0, ROOT)
+
+FIRST_NAMES = ["Maria", "João", "Ana", "José", "Dr. Paulo", "Irmã Célia", "Sítio Boa Vista", "Dona Rosa",
+               "Prof Ângela", "Tio Zé", "Lúcia", "Carlos 😀", "Vó Tereza"]
+LAST_NAMES = ["Silva", "Souza", "Oliveira", "Pereira", "Lima"]
+
+
+def random_number(rng):
+    return f"55{rng.randint(11, 99)}9{rng.randint(10000000, 99999999)}"
+
+
+def vcard(rng, photos=False):
+    """One WhatsApp-style export card, CRLF terminated, with a 10% chance of a recurring number."""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    number = random_number(rng) if rng.random() >= 0.1 else rng.choice(["5511987654321", "5521999990000"])
+    formatted = f"+{number[:2]} {number[2:4]} {number[4:9]}-{number[9:]}"
+    lines = ["BEGIN:VCARD", "VERSION:3.0", f"N:{name.split()[-1]};{name.split()[0]};;;", f"FN:{name}"]
+    kind = rng.random()
+    if kind < 0.6:
+        lines.append(f"TEL;type=CELL;type=VOICE;waid={number}:{formatted}")
+    elif kind < 0.8:
+        lines += [f"item1.TEL;waid={number}:{formatted}", "item1.X-ABLabel:Celular"]
+    else:
+        lines += ["TEL;TYPE=CELL:(11) 9999-0000", f"X-PHONE:{number}"]
+    if photos and rng.random() < 0.5:
+        photo = base64.b64encode(rng.randbytes(3000)).decode()
+        lines.append("PHOTO;ENCODING=b;TYPE=JPEG:" + photo[:60])
+        lines += [" " + photo[i:i + 74] for i in range(60, len(photo), 74)]
+    lines += ["NOTE:hello; world", "END:VCARD"]
+    return "\r\n".join(lines) + "\r\n"
+
+
+def vcf_text(cards, photos=False, seed=1):
+    rng = random.Random(seed)
+    return "".join(vcard(rng, photos) for _ in range(cards))
+
+
+def write_vcf(path, cards, photos=False, seed=1):
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        f.write(vcf_text(cards, photos, seed))
+    return path
+
+
+def log_numbers(count, seed=2):
+    rng = random.Random(seed)
+    return [random_number(rng) for _ in range(count)]
+
+
+def default_titles():
+    """The title list app.py writes into a new config.ini."""
+    with open(os.path.join(ROOT, 'app.py'), encoding='utf-8') as f:
+        source = f.read()
+    start = source.index('titles_to_remove = [')
+    return ast.literal_eval(source[source.index('[', start):source.index(']', start) + 1])
@@ -0,0 +1,198 @@
+import os
+import math
+import logging
+import threading
+from itertools import compress
+import numpy as np
+
+HEADER_WORDS = 16
+HEADER_BYTES = HEADER_WORDS * 8
+BLOOM_MAGIC = int.from_bytes(b'VCFBLOOM', 'little')
+BLOOM_FORMAT_VERSION = 2
+# Room left for numbers added after a rebuild, before the filter is rebuilt larger
+MIN_CAPACITY = 100_000
+INT64_MAX = np.iinfo(np.int64).max
+
+# Header layout: magic, version, bits, hashes, count, capacity, fp rate (parts per billion), stamp (6 words)
+_M, _K, _COUNT, _CAPACITY, _FP_RATE, _STAMP = 2, 3, 4, 5, 6, 7
+STAMP_WORDS = 6
+
+
+def _mix(x):
+    # splitmix64 finalizer; uint64 arithmetic wraps around as intended
+    x = x + np.uint64(0x9E3779B97F4A7C15)
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _encode_stamp(stamp):
+    """Flattens a store stamp, a tuple of up to three (int, int) pairs or None, into the 6 header words."""
+    words = []
+    for part in stamp:
+        words.extend(part if part is not None else (-1, -1))
+    return words + [-1] * (STAMP_WORDS - len(words))
+
+
+class BloomFilter:
+    """Bit array over a memory-mapped file: the bits are updated in place and the header records which
+    state of the processed log (its file stamp) the filter covers."""
+
+    def __init__(self, path):
+        self.path = path
+        self._map = np.memmap(path, dtype=np.uint8, mode='r+')
+        self._header = self._map[:HEADER_BYTES].view(np.int64)
+        if (len(self._map) < HEADER_BYTES or self._header[0] != BLOOM_MAGIC
+                or self._header[1] != BLOOM_FORMAT_VERSION or len(self._map) != HEADER_BYTES + self._header[_M] // 8):
+            raise ValueError(f"Not a Bloom filter file: {path}")
+        self._bits = self._map[HEADER_BYTES:]
+        self.m = int(self._header[_M])
+        self.k = int(self._header[_K])
+
+    @classmethod
+    def create(cls, path, values, fp_rate, stamp, write_file):
+        """Builds a filter sized for twice the given numbers and writes it with write_file(path, data)."""
+        capacity = max(2 * len(values), MIN_CAPACITY)
+        m = max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        m = (m + 7) // 8 * 8
+        k = min(16, max(1, round(m / capacity * math.log(2))))
+        marks = np.zeros(m, dtype=bool)
+        for positions in _positions(values, m, k):
+            marks[positions] = True
+        header = np.zeros(HEADER_WORDS, dtype=np.int64)
+        header[:_STAMP] = [BLOOM_MAGIC, BLOOM_FORMAT_VERSION, m, k, len(values), capacity, round(fp_rate * 1e9)]
+        header[_STAMP:_STAMP + STAMP_WORDS] = _encode_stamp(stamp)
+        write_file(path, header.tobytes() + np.packbits(marks, bitorder='little').tobytes())
+        return cls(path)
+
+    @property
+    def stamp_words(self):
+        return self._header[_STAMP:_STAMP + STAMP_WORDS].tolist()
+
+    def covers(self, stamp, fp_rate):
+        """True when the filter holds every number of the log as of stamp, at the configured rate."""
+        return (self.stamp_words == _encode_stamp(stamp) and self._header[_FP_RATE] == round(fp_rate * 1e9)
+                and self._header[_COUNT] <= self._header[_CAPACITY])
+
+    def might_contain_many(self, values):
+        h1, h2 = _hash_pair(values)
+        remaining = np.arange(len(values))
+        for i in range(self.k):
+            positions = (h1 + np.uint64(i) * h2) % np.uint64(self.m)
+            # About half the misses drop out at every probe, so later probes touch far fewer bits
+            hit = ((self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7))) & 1).astype(bool)
+            remaining, h1, h2 = remaining[hit], h1[hit], h2[hit]
+            if not len(remaining):
+                break
+        maybe = np.zeros(len(values), dtype=bool)
+        maybe[remaining] = True
+        return maybe
+
+    def add_many(self, values, stamp):
+        """Sets the bits of values, then moves the stamp forward; the bits reach the disk first."""
+        for positions in _positions(values, self.m, self.k):
+            np.bitwise_or.at(self._bits, positions >> np.uint64(3),
+                             (np.uint64(1) << (positions & np.uint64(7))).astype(np.uint8))
+        self._header[_COUNT] += len(values)
+        self._map.flush()
+        self._header[_STAMP:_STAMP + STAMP_WORDS] = _encode_stamp(stamp)
+        self._map.flush()
+
+
+def _hash_pair(values):
+    x = np.ascontiguousarray(values, dtype=np.int64).view(np.uint64)
+    return _mix(x), _mix(x ^ np.uint64(0x5BD1E9955BD1E995)) | np.uint64(1)
+
+
+def _positions(values, m, k):
+    h1, h2 = _hash_pair(values)
+    for i in range(k):
+        yield (h1 + np.uint64(i) * h2) % np.uint64(m)
+
+
+def _as_values(numbers):
+    # Numbers beyond int64 are never put in the filter; callers treat them as possible hits
+    return np.fromiter((n for n in numbers if n <= INT64_MAX), dtype=np.int64)
+
+
+class BloomFront:
+    """Optional Bloom filter in front of a log store: lookups only reach the store for possible hits.
+
+    The filter is persisted next to the log and rebuilt from the store when it no longer covers the
+    store's current file stamp, e.g. after another process or a hand edit changed the log.
+    """
+
+    def __init__(self, path, write_file, fp_rate=0):
+        self.path = path
+        self.fp_rate = fp_rate
+        # The store's crash-safe writer, so a rebuilt filter replaces the old one atomically
+        self._write_file = write_file
+        self._filter = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return 0 < (self.fp_rate or 0) < 1
+
+    def _current(self, stamp, all_values):
+        with self._lock:
+            if self._filter is None and os.path.exists(self.path):
+                try:
+                    self._filter = BloomFilter(self.path)
+                except Exception as e:
+                    logging.warning(f"Discarding unreadable Bloom filter {self.path}: {e}")
+            if self._filter is None or not self._filter.covers(stamp, self.fp_rate):
+                # The stamp is taken before the numbers are read, so the filter never claims a newer state
+                values = all_values()
+                self._filter = None
+                try:
+                    self._filter = BloomFilter.create(self.path, values, self.fp_rate, stamp, self._write_file)
+                    logging.info(f"Built Bloom filter for {len(values)} processed numbers ({self._filter.m // 8} bytes)")
+                except Exception as e:
+                    logging.warning(f"Could not write Bloom filter {self.path}: {e}")
+            # Another process may have replaced the file between writing and mapping it
+            if self._filter is not None and self._filter.covers(stamp, self.fp_rate):
+                return self._filter
+            return None
+
+    def candidates(self, keys, stamp, all_values):
+        """Returns the keys the store still has to check: every key the filter cannot rule out.
+
+        stamp() gives the store's current state and all_values() every number in it, for rebuilds.
+        """
+        keys = list(keys)
+        if not self.enabled or not keys:
+            return keys
+        bloom_filter = self._current(stamp(), all_values)
+        if bloom_filter is None:
+            return keys
+        try:
+            maybe = bloom_filter.might_contain_many(np.fromiter(map(int, keys), dtype=np.int64, count=len(keys)))
+        except OverflowError:
+            numbers = [int(key) for key in keys]
+            maybe = np.ones(len(keys), dtype=bool)
+            maybe[np.flatnonzero([number <= INT64_MAX for number in numbers])] = \
+                bloom_filter.might_contain_many(_as_values(numbers))
+        return list(compress(keys, maybe.tolist()))
+
+    def discard(self):
+        """Forgets the loaded filter after a failed write; the next lookup reloads or rebuilds it."""
+        self._filter = None
+
+    def written(self, before, after, added=()):
+        """Called under the store's write lock after it changed its files from stamp before to after.
+
+        Removals leave their bits set, which only costs an extra store lookup until the next rebuild.
+        """
+        bloom_filter = self._filter
+        if bloom_filter is None:
+            return
+        if not bloom_filter.covers(before, self.fp_rate):
+            # Someone else wrote in between; the next lookup rebuilds from the store
+            self._filter = None
+            return
+        try:
+            bloom_filter.add_many(_as_values(added), after)
+        except Exception as e:
+            logging.warning(f"Could not update Bloom filter {self.path}: {e}")
+            self._filter = None
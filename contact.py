@@ -0,0 +1,31 @@
+CONTACT_FIELDS = ('original_name', 'original_number', 'cleaned_number', 'cleaned_name')
+
+
+class Contact:
+    """One normalized contact. Slots rather than a dict, since large jobs hold millions of these.
+
+    The UI gets and sends back plain dicts with the same keys (to_dict / from_dict).
+    """
+    __slots__ = CONTACT_FIELDS
+
+    def __init__(self, original_name, original_number, cleaned_number, cleaned_name):
+        self.original_name = original_name
+        self.original_number = original_number
+        self.cleaned_number = cleaned_number
+        self.cleaned_name = cleaned_name
+
+    def __reduce__(self):
+        # Pickled as the bare fields, which keeps the results sent back by parse workers small
+        return Contact, (self.original_name, self.original_number, self.cleaned_number, self.cleaned_name)
+
+    def __repr__(self):
+        return f"Contact({self.original_name!r}, {self.cleaned_number!r})"
+
+    def to_dict(self):
+        return {field: getattr(self, field) for field in CONTACT_FIELDS}
+
+    @classmethod
+    def from_dict(cls, data):
+        # Contacts coming back from the UI may lack cleaned_name; process_and_save cleans those again
+        return cls(data.get('original_name') or '', data.get('original_number') or '', data.get('cleaned_number'),
+                   data.get('cleaned_name'))
@@ -0,0 +1,105 @@
+import os
+import csv
+import logging
+from itertools import islice
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+IMPORT_CHUNK_ROWS = 50_000
+# Shorter digit runs are extensions, dates and the like, not phone numbers
+MIN_NUMBER_DIGITS = 8
+NUMBER_COLUMN_HINTS = ('phone', 'telefone', 'numero', 'número')
+IMPORT_EXTENSIONS = ('.xlsx', '.xlsm', '.csv', '.txt')
+
+
+def number_columns(header):
+    """Indexes of the columns named like phone numbers, or the first column when none is."""
+    columns = [i for i, name in enumerate(header) if any(hint in str(name or '').lower() for hint in NUMBER_COLUMN_HINTS)]
+    return columns or [0]
+
+
+def extract_numbers(values):
+    """Vectorized digits-only conversion of cell values: returns (unique int64 array, list of numbers too long for it).
+
+    Numeric cells are used as they are, so an Excel float like 5511987654321.0 doesn't gain a trailing zero.
+    """
+    series = pd.Series(values, dtype=object).dropna()
+    types = series.map(type)
+    # Dates and other cell types are skipped rather than read as digit runs
+    numeric = np.abs(series[types.isin((int, float))].to_numpy(dtype=np.float64))
+    numeric = numeric[(numeric >= 10 ** (MIN_NUMBER_DIGITS - 1)) & (numeric < 1e18)].astype(np.int64)
+    digits = series[types == str].str.replace(r'\D+', '', regex=True)
+    lengths = digits.str.len()
+    fits = digits[(lengths >= MIN_NUMBER_DIGITS) & (lengths <= 18)].to_numpy(dtype=str).astype(np.int64)
+    return np.unique(np.concatenate([numeric, fits])), sorted({int(value) for value in digits[lengths > 18]})
+
+
+def _xlsx_chunks(path, chunk_rows, progress):
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        rows = sheet.iter_rows(values_only=True)
+        columns = number_columns(next(rows, ()))
+        total = sheet.max_row
+        done = 1
+        while True:
+            chunk = list(islice(rows, chunk_rows))
+            if not chunk:
+                break
+            done += len(chunk)
+            yield [row[i] for row in chunk for i in columns if i < len(row)], len(chunk)
+            progress(done / total if total else None)
+    finally:
+        workbook.close()
+
+
+def _csv_chunks(path, chunk_rows, progress):
+    total = os.path.getsize(path)
+    with open(path, 'r', encoding='utf-8-sig', errors='replace', newline='') as f:
+        sample = f.read(64 * 1024)
+        f.seek(0)
+        try:
+            delimiter = csv.Sniffer().sniff(sample, delimiters=',;\t|').delimiter
+        except csv.Error:
+            delimiter = ','
+        reader = pd.read_csv(f, sep=delimiter, dtype=str, chunksize=chunk_rows, keep_default_na=False,
+                             on_bad_lines='skip')
+        columns = None
+        for chunk in reader:
+            if columns is None:
+                columns = [chunk.columns[i] for i in number_columns(chunk.columns)]
+            yield chunk[columns].to_numpy().ravel(), len(chunk)
+            progress(min(f.tell() / total, 1.0) if total else None)
+
+
+def import_numbers(path, processed_log, chunk_rows=IMPORT_CHUNK_ROWS, on_progress=None):
+    """Streams an XLSX or CSV list of numbers into the processed log, chunk by chunk.
+
+    Only numbers not in the log yet are appended, so importing the same list twice adds nothing.
+    on_progress(status) gets a dict with rows, found, added and fraction (0..1, or None when unknown)
+    after every chunk. Returns the final status.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in IMPORT_EXTENSIONS:
+        raise ValueError(f"Unsupported file type '{extension}' (use one of: {', '.join(IMPORT_EXTENSIONS)})")
+    status = {'rows': 0, 'found': 0, 'added': 0, 'fraction': 0.0}
+    def progress(fraction):
+        status['fraction'] = fraction
+        if on_progress:
+            on_progress(dict(status))
+    read_chunks = _xlsx_chunks if extension in ('.xlsx', '.xlsm') else _csv_chunks
+    for values, rows in read_chunks(path, chunk_rows, progress):
+        numbers, long_numbers = extract_numbers(values)
+        candidates = numbers.tolist() + long_numbers
+        # Numbers added by earlier chunks are in the log by now, so repeats across chunks are skipped too
+        known = processed_log.contains_many(candidates) if candidates else set()
+        new_numbers = [number for number in candidates if number not in known]
+        if new_numbers:
+            processed_log.add_many(new_numbers)
+        status['rows'] += rows
+        status['found'] += len(candidates)
+        status['added'] += len(new_numbers)
+    status['fraction'] = 1.0
+    logging.info(f"Imported {path}: {status['rows']} rows, {status['added']} new of {status['found']} numbers")
+    return status
@@ -0,0 +1,162 @@
+import os
+import glob
+import json
+import logging
+from processed_log import FileLock, replace_file
+
+
+def pending_dir_for(log_path):
+    return os.path.splitext(log_path)[0] + '.pending'
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _sync(path):
+    with open(path, 'rb+') as f:
+        os.fsync(f.fileno())
+
+
+def _release(lock):
+    lock.close()
+    try:
+        os.remove(lock.lock_path)
+    except OSError:
+        pass
+
+
+def _read_intent(intent_path):
+    try:
+        with open(intent_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _roll_back(intent):
+    for temp_path, final_path in intent['files']:
+        _remove(temp_path)
+        _remove(final_path)
+
+
+def _roll_forward(processed_log, intent):
+    run_id = intent['run_id']
+    # The log append and the run record are separate writes, so a crash may have left the numbers without their run
+    if not any(run['run_id'] == run_id for run in processed_log.list_runs()):
+        processed_log.add_many(intent['numbers'], run_id=run_id, source=intent['source'],
+                               canonical=intent.get('canonical', False))
+    processed_log.finish_run(run_id, output_file=intent['output_file'])
+
+
+class OutputTransaction:
+    """Writes a run's output files and logs its numbers as one unit.
+
+    Final names are reserved up front by creating them empty with O_EXCL, and the outputs are written to
+    temp files next to them. An intent file in the log's .pending folder records the files: while it says
+    'prepare' an interruption removes them all, and once the files are renamed into place it says 'commit'
+    and the numbers are logged, which recovery retries. The log never lists numbers no output holds.
+    canonical is passed on to the log's add_many.
+    """
+
+    def __init__(self, processed_log, run_id, source=None, canonical=False):
+        self.processed_log = processed_log
+        pending_dir = pending_dir_for(processed_log.path)
+        os.makedirs(pending_dir, exist_ok=True)
+        self.intent_path = os.path.join(pending_dir, f"{run_id}.json")
+        self.intent = {'run_id': run_id, 'source': source, 'state': 'prepare', 'files': [],
+                       'output_file': None, 'numbers': [], 'canonical': canonical}
+        # Held for the whole transaction, so recovery in another process waits instead of undoing it
+        self._lock = FileLock(self.intent_path)
+
+    def __enter__(self):
+        self._lock.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.intent['state'] == 'prepare':
+                _roll_back(self.intent)
+                _remove(self.intent_path)
+        finally:
+            self._lock.__exit__(exc_type, exc, tb)
+            _release(self._lock)
+
+    def _save(self):
+        replace_file(self.intent_path, json.dumps(self.intent, ensure_ascii=False).encode('utf-8'))
+
+    def reserve(self, output_dir, base_name, file_names_for):
+        """Claims the first of base_name, base_name_1, ... for which every name in file_names_for(base) is free.
+
+        Returns the base; the claimed paths are written through temp_path() and published by publish().
+        """
+        counter, base = 0, base_name
+        while True:
+            created = []
+            try:
+                for name in file_names_for(base):
+                    path = os.path.join(output_dir, name)
+                    os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                    created.append(path)
+                break
+            except BaseException as e:
+                for path in created:
+                    _remove(path)
+                if not isinstance(e, FileExistsError):
+                    raise
+            counter += 1
+            base = f"{base_name}_{counter}"
+        self.intent['files'].extend([self.temp_path(path), path] for path in created)
+        self._save()
+        return base
+
+    def temp_path(self, final_path):
+        return f"{final_path}.{self.intent['run_id']}.tmp"
+
+    def publish(self):
+        """Syncs the written temp files and renames them over their reserved names."""
+        for temp_path, _ in self.intent['files']:
+            _sync(temp_path)
+        for temp_path, final_path in self.intent['files']:
+            os.replace(temp_path, final_path)
+
+    def commit(self, numbers, output_file):
+        """Logs the numbers of the published outputs. Returns False when that failed and is left to recovery."""
+        self.intent.update(state='commit', output_file=output_file, numbers=sorted(int(n) for n in numbers))
+        self._save()
+        try:
+            _roll_forward(self.processed_log, self.intent)
+        except Exception as e:
+            logging.error(f"Error writing run {self.intent['run_id']} to the log, it will be retried at next start: {e}")
+            return False
+        _remove(self.intent_path)
+        return True
+
+
+def recover_output_transactions(processed_log):
+    """Finishes or undoes the saves a crash interrupted. Returns how many were found."""
+    recovered = 0
+    for intent_path in sorted(glob.glob(os.path.join(pending_dir_for(processed_log.path), '*.json'))):
+        lock = FileLock(intent_path)
+        try:
+            with lock:
+                intent = _read_intent(intent_path)
+                if intent is None:
+                    continue
+                if intent['state'] == 'commit':
+                    _roll_forward(processed_log, intent)
+                    logging.info(f"Recovered run {intent['run_id']}: logged {len(intent['numbers'])} numbers "
+                                 f"of {intent['output_file']}")
+                else:
+                    _roll_back(intent)
+                    logging.info(f"Discarded the unfinished output files of run {intent['run_id']}")
+                _remove(intent_path)
+                recovered += 1
+        except Exception as e:
+            logging.error(f"Could not recover interrupted save '{intent_path}': {e}")
+        finally:
+            _release(lock)
+    return recovered
@@ -0,0 +1,128 @@
+import os
+import csv
+import zipfile
+from itertools import islice
+from openpyxl import Workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+OUTPUT_COLUMNS = ('Number', 'Name')
+PARQUET_BATCH_ROWS = 65536
+
+
+def write_xlsx(output_file_path, rows):
+    """Streams (number, name) rows into a one-sheet workbook using openpyxl's write-only mode.
+
+    Rows go to disk as they come, so memory stays flat however many contacts there are.
+    Returns the number of rows written.
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Sheet1')
+    sheet.append(OUTPUT_COLUMNS)
+    count = 0
+    for row in rows:
+        sheet.append(row)
+        count += 1
+    workbook.save(output_file_path)
+    return count
+
+
+def write_csv(output_file_path, rows):
+    count = 0
+    with open(output_file_path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(OUTPUT_COLUMNS)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def write_parquet(output_file_path, rows):
+    """Writes the rows in batches as an int64 Number / string Name table (needs pyarrow)."""
+    if pa is None:
+        raise RuntimeError("Parquet output needs the pyarrow package")
+    schema = pa.schema([(OUTPUT_COLUMNS[0], pa.int64()), (OUTPUT_COLUMNS[1], pa.string())])
+    count = 0
+    rows = iter(rows)
+    with pq.ParquetWriter(output_file_path, schema) as writer:
+        while True:
+            batch = list(islice(rows, PARQUET_BATCH_ROWS))
+            if not batch:
+                break
+            numbers, names = zip(*batch)
+            writer.write_batch(pa.record_batch([pa.array(numbers, pa.int64()), pa.array(names, pa.string())],
+                                               schema=schema))
+            count += len(batch)
+    return count
+
+
+def _vcard_text(value):
+    return str(value).replace('\\', '\\\\').replace(',', '\\,').replace(';', '\\;').replace('\n', '\\n')
+
+
+def _fold_vcard_line(line):
+    # vCard lines longer than 75 octets continue on lines that start with a space
+    data = line.encode('utf-8')
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts, start, limit = [], 0, 75
+    while start < len(data):
+        end = min(start + limit, len(data))
+        while end < len(data) and (data[end] & 0xC0) == 0x80:
+            end -= 1
+        parts.append(data[start:end].decode('utf-8'))
+        start, limit = end, 74
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def write_vcf(output_file_path, rows):
+    """Writes one vCard 3.0 per row with the cleaned name and number."""
+    count = 0
+    with open(output_file_path, 'w', encoding='utf-8', newline='') as f:
+        for number, name in rows:
+            name = _vcard_text(name)
+            f.write('BEGIN:VCARD\r\nVERSION:3.0\r\n' + _fold_vcard_line(f"N:;{name};;;") +
+                    _fold_vcard_line(f"FN:{name}") + f"TEL;TYPE=CELL:{number}\r\nEND:VCARD\r\n")
+            count += 1
+    return count
+
+
+# Format name: (file extension, writer)
+OUTPUT_FORMATS = {
+    'xlsx': ('.xlsx', write_xlsx),
+    'csv': ('.csv', write_csv),
+    'parquet': ('.parquet', write_parquet),
+    'vcf': ('.vcf', write_vcf),
+}
+DEFAULT_OUTPUT_FORMAT = 'xlsx'
+# Writers slow enough per row that shards are worth spreading over worker processes
+PARALLEL_OUTPUT_FORMATS = ('xlsx',)
+# Formats that are already compressed and are stored in bundles as they are
+COMPRESSED_OUTPUT_EXTENSIONS = ('.xlsx', '.parquet', '.zip')
+
+
+def available_output_formats():
+    return [name for name in OUTPUT_FORMATS if name != 'parquet' or pa is not None]
+
+
+def output_format_error(output_format):
+    """Returns why a format can't be written here, or None when it can."""
+    if output_format not in OUTPUT_FORMATS:
+        return f"Unknown output format '{output_format}' (use one of: {', '.join(OUTPUT_FORMATS)})"
+    if output_format not in available_output_formats():
+        return f"Output format '{output_format}' needs pyarrow, which is not installed"
+    return None
+
+
+def bundle_files(zip_path, file_paths, names=None):
+    """Zips the files flat into zip_path, under names when given, deflating only those that aren't compressed already."""
+    with zipfile.ZipFile(zip_path, 'w') as bundle:
+        for file_path, name in zip(file_paths, names or map(os.path.basename, file_paths)):
+            compressed = os.path.splitext(name)[1].lower() in COMPRESSED_OUTPUT_EXTENSIONS
+            bundle.write(file_path, name, compress_type=zipfile.ZIP_STORED if compressed else zipfile.ZIP_DEFLATED)
+    return zip_path
@@ -0,0 +1,143 @@
+import os
+import json
+import hashlib
+import mmap
+import logging
+import threading
+from contact import Contact, CONTACT_FIELDS
+
+DEFAULT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_FORMAT_VERSION = 1
+
+
+def hash_file_content(file_path):
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            digest.update(mm)
+    return digest.hexdigest()
+
+
+def titles_version(titles, normalization_version):
+    """Fingerprint of everything besides the file that shapes the normalized contacts."""
+    payload = json.dumps([normalization_version, list(titles or [])], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+class ParseCache:
+    """On-disk cache of normalized contacts per VCF file, evicted least-recently-used by total size."""
+
+    def __init__(self, cache_dir, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def key_for(self, vcf_file_path, version):
+        stat = os.stat(vcf_file_path)
+        content_hash = hash_file_content(vcf_file_path)
+        return f"{stat.st_size}-{stat.st_mtime_ns}-{content_hash}-{version}"
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        entry_path = self._entry_path(key)
+        try:
+            with open(entry_path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            if entry.get('format') != CACHE_FORMAT_VERSION:
+                return None
+            # Touching the entry on a hit is what makes eviction least-recently-used
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.warning(f"Discarding unreadable parse cache entry {entry_path}: {e}")
+            self._remove(entry_path)
+            return None
+        contacts = [Contact(*row) for row in entry['contacts']]
+        logging.info(f"Parse cache hit: {key} ({len(contacts)} contacts)")
+        return contacts, entry.get('stats', {})
+
+    def put(self, key, normalized_contacts, parse_stats):
+        if self.max_bytes <= 0:
+            return
+        entry_path = self._entry_path(key)
+        temp_path = f"{entry_path}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            entry = {
+                'format': CACHE_FORMAT_VERSION,
+                'stats': parse_stats,
+                'contacts': [[getattr(contact, field) for field in CONTACT_FIELDS] for contact in normalized_contacts]
+            }
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, entry_path)
+            logging.info(f"Stored parse cache entry: {key}")
+        except Exception as e:
+            logging.warning(f"Could not write parse cache entry {entry_path}: {e}")
+            self._remove(temp_path)
+            return
+        self._evict(keep=entry_path)
+
+    def _names_path(self, version):
+        return os.path.join(self.cache_dir, f"names-{version}.json")
+
+    def get_names(self, version):
+        """(raw name, cleaned name) pairs saved for a title list, oldest first."""
+        try:
+            with open(self._names_path(version), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return []
+        except Exception as e:
+            logging.warning(f"Discarding unreadable name cache {self._names_path(version)}: {e}")
+            self._remove(self._names_path(version))
+            return []
+        return entry['names'] if entry.get('format') == CACHE_FORMAT_VERSION else []
+
+    def put_names(self, version, pairs):
+        if self.max_bytes <= 0:
+            return
+        names_path = self._names_path(version)
+        # Processors on the same title list share one file, so concurrent saves each use their own temp file
+        temp_path = f"{names_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'format': CACHE_FORMAT_VERSION, 'names': pairs}, f, ensure_ascii=False, separators=(',', ':'))
+            os.replace(temp_path, names_path)
+        except Exception as e:
+            logging.warning(f"Could not write name cache {names_path}: {e}")
+            self._remove(temp_path)
+            return
+        self._evict(keep=names_path)
+
+    def _evict(self, keep=None):
+        try:
+            entries = []
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.is_file() and entry.name.endswith('.json'):
+                        stat = entry.stat()
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        except Exception as e:
+            logging.warning(f"Could not list parse cache directory {self.cache_dir}: {e}")
+            return
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            self._remove(path)
+            total_bytes -= size
+            logging.info(f"Evicted parse cache entry: {os.path.basename(path)}")
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
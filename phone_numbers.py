@@ -0,0 +1,243 @@
+import logging
+from itertools import compress
+import numpy as np
+
+DEFAULT_COUNTRY_CODE = '55'
+DEFAULT_AREA_CODE = '11'
+# Longer digit runs don't fit int64 and are only ever matched exactly
+MAX_KEY_DIGITS = 18
+# Before 2016, Brazilian mobiles had 8 digits starting with 6-9; the 9th digit was put in front of them
+LEGACY_MOBILE_COUNTRY = '55'
+# Digit counts of international numbers (country code included) that are keyed as written
+E164_MIN_DIGITS, E164_MAX_DIGITS = 7, 15
+INT64_MAX = np.iinfo(np.int64).max
+_POWERS = 10 ** np.arange(MAX_KEY_DIGITS + 1, dtype=np.int64)
+
+
+def phone_defaults(country_code, area_code):
+    """Validated default country and area codes, as digit strings; the area code may be empty."""
+    country_code, area_code = str(country_code or '').strip().lstrip('+'), str(area_code or '').strip()
+    if not (country_code.isdigit() and 1 <= len(country_code) <= 3 and country_code[0] != '0'):
+        logging.warning(f"Invalid default country code {country_code!r}, using {DEFAULT_COUNTRY_CODE}")
+        country_code = DEFAULT_COUNTRY_CODE
+    if area_code and not (area_code.isdigit() and len(area_code) == 2 and '0' not in area_code):
+        logging.warning(f"Invalid default area code {area_code!r}, using {DEFAULT_AREA_CODE}")
+        area_code = DEFAULT_AREA_CODE
+    return country_code, area_code
+
+
+# 10 ** e for the exponents digit counts can yield, -3 to 19, clamped to 1 and 10 ** 18 at the ends
+_POWER_TABLE = np.concatenate([[1, 1, 1], _POWERS, [_POWERS[-1]]])
+
+
+def _power(exponents):
+    # A table lookup; np.clip costs more than the rest of a small batch
+    return _POWER_TABLE[exponents + 3]
+
+
+def _is_national(values, digits):
+    """Marks numbers of the Brazilian plan: a two-digit area code without zeros, then 9 + 8 digits (mobiles)
+    or 8 digits starting with 2-9 (landlines and legacy mobiles)."""
+    area = values // _power(digits - 2)
+    first = values % _power(digits - 2) // _power(digits - 3)
+    return ((((digits == 11) & (first == 9)) | ((digits == 10) & (first >= 2)))
+            & (area >= 11) & (area <= 99) & (area % 10 != 0))
+
+
+def canonical_keys(values, leading_zeros, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE,
+                   international=False):
+    """E.164 int64 keys of digits-only numbers given as int64 values plus their count of leading zeros.
+
+    International numbers, written with + (marked in the international mask) or dialed with 00, keep their own
+    country code and are keyed as written. Of the others, numbers with the country code are kept, national ones
+    (area code + number, optionally dialed with 0 and a carrier code) get the country code, and 8-9 digit ones
+    the country and default area codes. Numbers of any other shape get -1 and are kept as they are written.
+    """
+    values = np.array(values, dtype=np.int64)
+    leading_zeros = np.asarray(leading_zeros)
+    digits = np.searchsorted(_POWERS, values, side='right')
+    country, country_digits = int(country_code), len(country_code)
+    keys = np.full(len(values), -1, dtype=np.int64)
+    international = np.broadcast_to(international, values.shape) | (leading_zeros >= 2)
+    rows = np.flatnonzero(international & (digits >= E164_MIN_DIGITS) & (digits <= E164_MAX_DIGITS))
+    keys[rows] = values[rows]
+    # Each national rule only looks at the rows with a digit count it can match
+    national_digits = np.where(international, 0, digits)
+    # 0 + two-digit carrier code + area code + number, as dialed for long-distance calls
+    rows = np.flatnonzero((leading_zeros > 0) & ((national_digits == 12) | (national_digits == 13)))
+    national = values[rows] % _power(digits[rows] - 2)
+    carrier = _is_national(national, digits[rows] - 2)
+    rows = rows[carrier]
+    values[rows] = national[carrier]
+    digits[rows] -= 2
+    national_digits[rows] -= 2
+    rows = np.flatnonzero((national_digits == 10) | (national_digits == 11))
+    rows = rows[_is_national(values[rows], digits[rows])]
+    keys[rows] = country * _power(digits[rows]) + values[rows]
+    if area_code:
+        rows = np.flatnonzero((national_digits == 8) | (national_digits == 9))
+        rows = rows[_is_national(int(area_code) * _power(digits[rows]) + values[rows], digits[rows] + 2)]
+        keys[rows] = (country * 100 + int(area_code)) * _power(digits[rows]) + values[rows]
+    subscriber_digits = national_digits - country_digits
+    rows = np.flatnonzero((keys < 0) & ((subscriber_digits == 10) | (subscriber_digits == 11)))
+    rows = rows[values[rows] // _power(subscriber_digits[rows]) == country]
+    rows = rows[_is_national(values[rows] % _power(subscriber_digits[rows]), subscriber_digits[rows])]
+    keys[rows] = values[rows]
+    return keys
+
+
+def _int_values(numbers):
+    """(int64 values, leading zero counts, mask of the numbers that fit) of digit strings."""
+    lengths = np.fromiter(map(len, numbers), dtype=np.int64, count=len(numbers))
+    fits = (lengths > 0) & (lengths <= MAX_KEY_DIGITS)
+    values = np.zeros(len(numbers), dtype=np.int64)
+    values[fits] = np.fromiter(map(int, compress(numbers, fits.tolist())), dtype=np.int64,
+                               count=int(np.count_nonzero(fits)))
+    return values, lengths - np.searchsorted(_POWERS, values, side='right'), fits
+
+
+def canonical_numbers(numbers, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE, international=False):
+    """Batch E.164 normalization of digits-only strings: canonical digits, or the number as given when it has no key.
+
+    international marks the numbers that were written with a leading +, as a mask or one bool for all.
+    """
+    numbers = list(numbers)
+    if not numbers:
+        return []
+    values, leading_zeros, fits = _int_values(numbers)
+    keys = canonical_keys(values, leading_zeros, country_code, area_code, international)
+    # Numbers already in E.164 form are kept as the same strings
+    changed = fits & (keys >= 0) & ((keys != values) | (leading_zeros > 0))
+    return [str(key) if change else number for key, change, number in zip(keys.tolist(), changed.tolist(), numbers)]
+
+
+def key_scheme(country_code, area_code):
+    """The default codes equivalence keys were computed for, as a pair of ints (no area code is 0)."""
+    return int(country_code), int(area_code or 0)
+
+
+def _equivalence_keys(values, leading_zeros, country_code, area_code, international=False):
+    keys = canonical_keys(values, leading_zeros, country_code, area_code, international)
+    if country_code == LEGACY_MOBILE_COUNTRY:
+        # 55 + area + 8 digits starting with 6-9 -> 55 + area + 9 + the same 8 digits
+        legacy = (keys >= 55 * _POWERS[10]) & (keys < 56 * _POWERS[10]) & (keys % _POWERS[8] // _POWERS[7] >= 6)
+        keys[legacy] = keys[legacy] // _POWERS[8] * _POWERS[9] + 9 * _POWERS[8] + keys[legacy] % _POWERS[8]
+    # Numbers without a key only match themselves
+    return np.where(keys >= 0, keys, values)
+
+
+def equivalence_keys(numbers, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE, international=False):
+    """int64 keys of digit strings that are equal for every way of writing the same number: with or without the country and
+    area codes, and legacy 8-digit mobiles as their 9-digit form. Numbers too long for int64 get -1.
+
+    Pass international=True for canonical_numbers output, which already carries its country code: read as
+    national numbers, foreign ones such as 79912345678 (+7) would take the default country code.
+    """
+    numbers = list(numbers)
+    values, leading_zeros, fits = _int_values(numbers)
+    keys = _equivalence_keys(values, leading_zeros, country_code, area_code, international)
+    keys[~fits] = -1
+    return keys
+
+
+def number_keys(values, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE, international=False):
+    """Equivalence keys of logged numbers, given as int64 values; what log stores keep next to each number.
+
+    international marks canonical_numbers output, as runs log it; other entries (imported, added by hand or
+    logged before numbers were normalized) are read as national numbers when they look like one.
+    """
+    values = np.asarray(values, dtype=np.int64)
+    return _equivalence_keys(values, np.zeros(len(values), dtype=np.int64), country_code, area_code, international)
+
+
+class KeyedNumbers:
+    """Logged numbers in the order of their equivalence keys: the text log's keyed array, next to its SortedNumberIndex.
+
+    Keys are computed as numbers are added, so finding every logged form of a number is one searchsorted.
+    A number logged both as a canonical and as a national entry is kept under both keys. Both arrays are
+    replaced as a whole on each change, so lookups need no lock.
+    """
+
+    def __init__(self, values, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE, international=False):
+        self.country_code, self.area_code = country_code, area_code
+        self._state = self._keyed(values, international)
+
+    def _keyed(self, values, international=False):
+        values = np.asarray(values, dtype=np.int64) if isinstance(values, np.ndarray) else \
+            np.fromiter((number for number in map(int, values) if number <= INT64_MAX), dtype=np.int64)
+        keys = number_keys(values, self.country_code, self.area_code, international)
+        order = np.argsort(keys, kind='stable')
+        return keys[order], values[order]
+
+    def keys(self):
+        return self._state[0]
+
+    def add_many(self, values, international=False):
+        keys, values = self._keyed(values, international)
+        if len(keys):
+            sorted_keys, logged = self._state
+            positions = np.searchsorted(sorted_keys, keys)
+            self._state = (np.insert(sorted_keys, positions, keys), np.insert(logged, positions, values))
+
+    def discard_many(self, values):
+        values = np.fromiter((number for number in map(int, values) if number <= INT64_MAX), dtype=np.int64)
+        # Under the keys of both readings, as either kind of entry may have logged each number
+        keys = np.concatenate([number_keys(values, self.country_code, self.area_code),
+                               number_keys(values, self.country_code, self.area_code, True)])
+        values = np.concatenate([values, values])
+        sorted_keys, logged = self._state
+        starts, ends = np.searchsorted(sorted_keys, keys), np.searchsorted(sorted_keys, keys, side='right')
+        # Each key's run is short: the few forms one phone was logged in
+        drop = {position for start, end, value in zip(starts.tolist(), ends.tolist(), values.tolist())
+                for position in range(start, end) if logged[position] == value}
+        if drop:
+            self._state = (np.delete(sorted_keys, list(drop)), np.delete(logged, list(drop)))
+
+    def found_keys(self, keys):
+        """The ones of keys that some logged number has."""
+        sorted_keys = self._state[0]
+        keys = np.asarray(keys, dtype=np.int64)
+        if not len(sorted_keys):
+            return keys[:0]
+        positions = np.searchsorted(sorted_keys, keys).clip(max=len(sorted_keys) - 1)
+        return keys[sorted_keys[positions] == keys]
+
+    def forms(self, keys):
+        """The logged numbers that have any of keys."""
+        sorted_keys, logged = self._state
+        keys = np.asarray(keys, dtype=np.int64)
+        starts, ends = np.searchsorted(sorted_keys, keys), np.searchsorted(sorted_keys, keys, side='right')
+        return [number for start, end in zip(starts.tolist(), ends.tolist()) for number in logged[start:end].tolist()]
+
+
+def _distinct_keys(keys):
+    # Sorted and deduplicated; np.unique hashes, which is several times slower on a million keys
+    keys = np.sort(keys[keys >= 0])
+    return keys[np.concatenate([[True], keys[1:] != keys[:-1]])] if len(keys) else keys
+
+
+class EquivalenceIndex:
+    """Finds numbers logged in any equivalent form, through the keys a log store computed when it wrote them.
+
+    logged_keys(keys) returns the ones of keys found in the store, logged_forms(keys) the numbers logged with them.
+    """
+
+    def __init__(self, logged_keys, logged_forms, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE):
+        self.country_code, self.area_code = country_code, area_code
+        self._logged_keys, self._logged_forms = logged_keys, logged_forms
+
+    def contains_many(self, numbers, keys=None):
+        """Returns the subset of numbers (kept as given) logged in this or any equivalent form.
+
+        keys are the numbers' equivalence_keys, when the caller already has them.
+        """
+        numbers = list(numbers)
+        if keys is None:
+            keys = equivalence_keys(numbers, self.country_code, self.area_code)
+        found = np.isin(keys, self._logged_keys(_distinct_keys(keys)))
+        return set(compress(numbers, found.tolist()))
+
+    def logged_forms(self, numbers, international=False):
+        """The logged numbers (ints) equivalent to any of numbers; international as for equivalence_keys."""
+        keys = equivalence_keys(numbers, self.country_code, self.area_code, international)
+        return set(self._logged_forms(_distinct_keys(keys)))
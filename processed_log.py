@@ -0,0 +1,1036 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import sqlite3
+import threading
+import logging
+from itertools import compress
+import numpy as np
+from bloom_filter import BloomFront
+from phone_numbers import EquivalenceIndex, KeyedNumbers, key_scheme, number_keys, DEFAULT_COUNTRY_CODE, DEFAULT_AREA_CODE
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+# SQLite's default limit on bound parameters is 999 in older builds
+SQLITE_BATCH_SIZE = 500
+# Added numbers are kept in a plain set until there are this many, then merged into the sorted array
+DELTA_MERGE_SIZE = 4096
+INT64_MAX = np.iinfo(np.int64).max
+# Tombstones appended to the text log before it is compacted in the background
+TOMBSTONE_COMPACT_THRESHOLD = 100_000
+
+
+def _as_numbers(numbers):
+    return [int(number) for number in numbers]
+
+
+def _sqlite_rows(numbers):
+    # SQLite integers are 64-bit; longer digit strings are not phone numbers and are left out
+    for number in numbers:
+        number = int(number)
+        if number <= INT64_MAX:
+            yield (number,)
+        else:
+            logging.warning(f"Skipping number too long for the SQLite log: {number}")
+
+
+def _sorted_unique(values):
+    values = np.sort(values)
+    if len(values) > 1:
+        keep = np.empty(len(values), dtype=bool)
+        keep[0] = True
+        np.not_equal(values[1:], values[:-1], out=keep[1:])
+        values = values[keep]
+    return values
+
+
+class SortedNumberIndex:
+    """A set of numbers held as a sorted int64 array (8 bytes per number) plus a small delta set.
+
+    Lookups of many numbers at once are a single searchsorted over the array.
+    """
+
+    def __init__(self, values=None):
+        self._sorted = _sorted_unique(np.asarray(values if values is not None else [], dtype=np.int64))
+        self._added = set()
+        # Digit strings too long for int64 never enter the array
+        self._oversized = set()
+
+    def _in_sorted(self, values):
+        if not len(self._sorted):
+            return np.zeros(len(values), dtype=bool)
+        # Searching in sorted order walks the array forwards, which is about 3x faster on large logs
+        order = np.argsort(values)
+        ordered_values = values[order]
+        positions = np.searchsorted(self._sorted, ordered_values)
+        positions[positions == len(self._sorted)] = 0
+        hits = np.empty(len(values), dtype=bool)
+        hits[order] = self._sorted[positions] == ordered_values
+        return hits
+
+    def _split_oversized(self, numbers):
+        fitting = []
+        for number in numbers:
+            if number > INT64_MAX: self._oversized.add(number)
+            else: fitting.append(number)
+        return np.fromiter(fitting, dtype=np.int64, count=len(fitting))
+
+    def add_many(self, numbers):
+        values = self._split_oversized(numbers)
+        self._added.update(values[~self._in_sorted(values)].tolist())
+        if len(self._added) >= DELTA_MERGE_SIZE:
+            self._merge()
+
+    def _merge(self):
+        added = np.fromiter(self._added, dtype=np.int64, count=len(self._added))
+        self._sorted = _sorted_unique(np.concatenate([self._sorted, added]))
+        self._added.clear()
+
+    def discard_many(self, numbers):
+        numbers = set(numbers)
+        self._added -= numbers
+        self._oversized -= numbers
+        values = np.fromiter((n for n in numbers if n <= INT64_MAX), dtype=np.int64)
+        if len(values) and len(self._sorted):
+            positions = np.searchsorted(self._sorted, values)
+            found = positions < len(self._sorted)
+            found[found] = self._sorted[positions[found]] == values[found]
+            self._sorted = np.delete(self._sorted, positions[found])
+
+    def __contains__(self, number):
+        if number in self._added or number in self._oversized:
+            return True
+        if number > INT64_MAX:
+            return False
+        position = np.searchsorted(self._sorted, number)
+        return position < len(self._sorted) and self._sorted[position] == number
+
+    def contains_many(self, numbers):
+        """Returns the subset of numbers (digit strings or ints, kept as given) that are in the index."""
+        keys = list(numbers)
+        try:
+            values = np.fromiter(map(int, keys), dtype=np.int64, count=len(keys))
+        except OverflowError:
+            return {key for key in keys if int(key) in self}
+        hits = self._in_sorted(values)
+        # A snapshot, since another thread's add_many may grow the set meanwhile
+        added = tuple(self._added)
+        if added:
+            hits |= np.isin(values, np.array(added, dtype=np.int64))
+        return set(compress(keys, hits.tolist()))
+
+    def __len__(self):
+        return len(self._sorted) + len(self._added) + len(self._oversized)
+
+    def values(self):
+        """The int64 numbers, unordered; numbers beyond int64 are left out."""
+        added = tuple(self._added)
+        return np.concatenate([self._sorted, np.array(added, dtype=np.int64)])
+
+
+def _digit_lines_only(data):
+    """True when every line of data is digits, after an optional '-' and before an optional '\\r', or empty.
+
+    Only then is np.fromstring safe: numpy 1.x stops at the first other line with just a warning, and it splits
+    a line like '55 11 9' into three numbers.
+    """
+    data = np.frombuffer(data, dtype=np.uint8)
+    # Checked at the non-digit bytes alone, which are about one per line
+    others = np.flatnonzero((data < 48) | (data > 57))
+    chars = data[others]
+    minus, cr = others[chars == 45], others[chars == 13]
+    if not np.all((chars == 10) | (chars == 45) | (chars == 13)):
+        return False
+    after = np.append(data, np.uint8(10))
+    return not (np.any((minus > 0) & (data[minus - 1] != 10)) or np.any((after[minus + 1] < 48) | (after[minus + 1] > 57))
+                or np.any(after[cr + 1] != 10))
+
+
+def _parse_log_entries(data):
+    """Returns the log lines as int64 values in file order, tombstones (-number) as negative values.
+
+    Entries beyond int64 are returned separately as Python ints, also in file order.
+    """
+    try:
+        if not _digit_lines_only(data):
+            raise ValueError
+        # A log of plain digit lines is parsed by numpy in one call
+        values = np.fromstring(data, dtype=np.int64, sep='\n') if data.strip() else np.empty(0, dtype=np.int64)
+        # numpy clamps entries that overflow int64 instead of failing
+        if len(values) and (values.max() == INT64_MAX or values.min() <= -INT64_MAX):
+            raise OverflowError
+        return values, []
+    except (ValueError, OverflowError):
+        fitting, oversized = [], []
+        for line in data.decode('utf-8', 'replace').splitlines():
+            line = line.strip()
+            if not line.removeprefix('-').isdigit():
+                continue
+            value = int(line)
+            if abs(value) > INT64_MAX: oversized.append(value)
+            else: fitting.append(value)
+        return np.array(fitting, dtype=np.int64), oversized
+
+
+def _surviving_entries(values):
+    """Marks the entries that no later tombstone of the same number cancels; tombstones are never marked."""
+    keep = values >= 0
+    tombstones = np.flatnonzero(~keep)
+    if not len(tombstones):
+        return keep
+    removed = -values[tombstones]
+    # Positions are ascending, so after a stable sort each number's last tombstone ends its run
+    order = np.argsort(removed, kind='stable')
+    removed, tombstones = removed[order], tombstones[order]
+    last = np.empty(len(removed), dtype=bool)
+    last[-1] = True
+    np.not_equal(removed[1:], removed[:-1], out=last[:-1])
+    removed, last_tombstone = removed[last], tombstones[last]
+    positions = np.searchsorted(removed, values).clip(max=len(removed) - 1)
+    cancelled = (removed[positions] == values) & (np.arange(len(values)) < last_tombstone[positions])
+    return keep & ~cancelled
+
+
+def _surviving_oversized(entries):
+    last_tombstone = {-value: i for i, value in enumerate(entries) if value < 0}
+    return [value > 0 and i > last_tombstone.get(value, -1) for i, value in enumerate(entries)]
+
+
+def _surviving_numbers(values, oversized):
+    """Returns the surviving entries, in log order, as Python ints."""
+    return values[_surviving_entries(values)].tolist() + list(compress(oversized, _surviving_oversized(oversized)))
+
+
+def _replay_log(values, oversized, canonical):
+    """Returns (int64 numbers, whether a run logged each as a canonical number, oversized numbers) of the entries
+    whose last entry in the log is not a tombstone."""
+    surviving = _surviving_entries(values)
+    return values[surviving], canonical[surviving], list(compress(oversized, _surviving_oversized(oversized)))
+
+
+def _lock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        return
+    os.lseek(fd, 0, os.SEEK_SET)
+    while True:
+        try:
+            # LK_LOCK gives up after about 10 seconds, so keep waiting like flock does
+            msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            return
+        except OSError:
+            continue
+
+
+def _unlock_fd(fd):
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    """Exclusive lock on a file for the threads of this process and for other processes (OS lock on path.lock)."""
+
+    def __init__(self, path):
+        self.lock_path = f"{path}.lock"
+        self._thread_lock = threading.Lock()
+        self._fd = None
+
+    def _os_lock_fd(self):
+        if self._fd is None:
+            try:
+                self._fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            except OSError as e:
+                # A read-only folder still works for a single process
+                logging.warning(f"Could not open lock file '{self.lock_path}', locking within this process only: {e}")
+                self._fd = -1
+        return self._fd
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            fd = self._os_lock_fd()
+            if fd >= 0:
+                _lock_fd(fd)
+        except BaseException:
+            self._thread_lock.release()
+            raise
+        return self
+
+    def __exit__(self, *exc_info):
+        try:
+            if self._fd is not None and self._fd >= 0:
+                _unlock_fd(self._fd)
+        finally:
+            self._thread_lock.release()
+
+    def close(self):
+        """Closes the lock file of a lock that won't be used again."""
+        if self._fd is not None and self._fd >= 0:
+            os.close(self._fd)
+        self._fd = None
+
+
+_file_locks = {}
+_file_locks_guard = threading.Lock()
+
+
+def file_lock(path):
+    # Every store on the same file shares one lock, so compaction never races an append in this process
+    with _file_locks_guard:
+        key = os.path.normcase(os.path.abspath(path))
+        lock = _file_locks.get(key)
+        if lock is None:
+            lock = _file_locks[key] = FileLock(key)
+        return lock
+
+
+def replace_file(path, data):
+    """Writes data to path through a synced temp file, so a crash leaves either the old or the new content."""
+    # Writers that don't share a lock, like Bloom filter rebuilds in two processes, each get their own temp file
+    temp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+# Tombstones appended by this process since the log was last compacted, per log path
+_pending_tombstones = {}
+
+
+def new_run_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+def _segment_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class RunJournal:
+    """Metadata of the processing runs written to a log, kept in a small JSON file next to it.
+
+    Listing runs and rolling one back only touch this file, never the log itself.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = file_lock(path)
+
+    def read(self):
+        if not os.path.exists(self.path):
+            return []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading run journal '{self.path}': {e}")
+            return []
+
+    def _write(self, runs):
+        replace_file(self.path, json.dumps(runs, ensure_ascii=False, indent=2).encode('utf-8'))
+
+    def record(self, *new_runs):
+        if not new_runs:
+            return
+        with self._lock:
+            runs = self.read()
+            runs.extend(new_runs)
+            self._write(runs)
+
+    def update(self, run_id, **fields):
+        """Updates one run and returns it, or returns None when the run is unknown."""
+        with self._lock:
+            runs = self.read()
+            for run in runs:
+                if run['run_id'] == run_id:
+                    run.update(fields)
+                    self._write(runs)
+                    return run
+        return None
+
+    def replace_all(self, runs):
+        with self._lock:
+            self._write(runs)
+
+    def get(self, run_id):
+        return next((run for run in self.read() if run['run_id'] == run_id), None)
+
+    def list(self):
+        return list(reversed(self.read()))
+
+
+def _without_ranges(data, ranges):
+    if not ranges:
+        return data
+    pieces, position = [], 0
+    for start, end in sorted(ranges):
+        pieces.append(data[position:start])
+        position = end
+    pieces.append(data[position:])
+    return b''.join(pieces)
+
+
+def _complete_lines(data):
+    # A write still in progress in another process, or cut short by a crash, ends without a newline. A last
+    # line of digits alone is kept: that is a number typed into the log without Enter, e.g. in notepad.
+    end = data.rfind(b'\n') + 1
+    return data if data[end:].strip().isdigit() else data[:end]
+
+
+def _truncate_torn_tail(f):
+    """Cuts a partial last line left by a crash in the middle of an append, which was never acknowledged.
+
+    A last line of digits alone is ended with a newline instead, as readers take it for a complete number.
+    """
+    end = f.seek(0, os.SEEK_END)
+    if end == 0:
+        return
+    f.seek(end - 1)
+    if f.read(1) == b'\n':
+        return
+    position = end
+    while position > 0:
+        chunk_start = max(0, position - 65536)
+        f.seek(chunk_start)
+        newline = f.read(position - chunk_start).rfind(b'\n')
+        if newline >= 0:
+            position = chunk_start + newline + 1
+            break
+        position = chunk_start
+    if position < end:
+        f.seek(position)
+        if f.read(end - position).strip().isdigit():
+            f.write(b'\n')
+            return
+        logging.warning(f"Dropping {end - position} bytes of an interrupted write at the end of '{f.name}'")
+        f.truncate(position)
+
+
+def _run_journal_for(log_path):
+    return RunJournal(os.path.splitext(log_path)[0] + '.runs.json')
+
+
+class TextLogStore:
+    """The flat NAO_APAGAR.log: one number per line, loaded into a SortedNumberIndex on first lookup,
+    with a KeyedNumbers array of the numbers' equivalence keys alongside.
+
+    Removals are appended as tombstone lines (-number) and folded into a fresh log by compact().
+    Each run's numbers form one contiguous byte range of the log; rolled back ranges are skipped on read.
+    """
+
+    def __init__(self, path, bloom_fp_rate=0):
+        self.path = path
+        self.runs = _run_journal_for(path)
+        self.bloom = BloomFront(os.path.splitext(path)[0] + '.bloom', replace_file, bloom_fp_rate)
+        self._numbers = None
+        self._keyed = None
+        self._key_scheme = (DEFAULT_COUNTRY_CODE, DEFAULT_AREA_CODE)
+        self._stamp = None
+        self._lock = file_lock(path)
+        # Appends and tombstones waiting for the writer that holds the lock to commit them together
+        self._queue = []
+        self._queue_lock = threading.Lock()
+        self._equivalence = None
+
+    def _file_stamp(self):
+        stamp = []
+        for path in (self.path, self.runs.path):
+            try:
+                stat = os.stat(path)
+                stamp.append((stat.st_mtime_ns, stat.st_size))
+            except FileNotFoundError:
+                stamp.append(None)
+        # The default codes the keys are computed for, so changing them rebuilds the keyed array and Bloom filter
+        return (*stamp, key_scheme(*self._key_scheme))
+
+    def _loaded(self):
+        # Only the log and journal metadata are checked; the index is rebuilt when either changed on disk
+        stamp = self._file_stamp()
+        if self._numbers is None or stamp != self._stamp:
+            # Stamped before reading, so an append that lands during the read triggers another load
+            self._stamp = stamp
+            numbers, self._keyed = self._read()
+            self._numbers = numbers
+        return self._numbers
+
+    def _refresh_stamp(self, before, added=()):
+        # Called under the lock after this store's own writes. The index and the Bloom filter stay valid only
+        # if they matched the files before the write; otherwise another process wrote since they were loaded.
+        after = self._file_stamp()
+        if self._numbers is not None:
+            if before == self._stamp:
+                self._stamp = after
+            else:
+                self._numbers = None
+        self.bloom.written(before, after, added)
+
+    def _keys_of(self, numbers, canonical):
+        values = np.fromiter((number for number in numbers if number <= INT64_MAX), dtype=np.int64)
+        return number_keys(values, *self._key_scheme, canonical).tolist()
+
+    def _run_ranges(self, data, runs):
+        """Returns the byte ranges of active and rolled back runs that still hold what each run wrote."""
+        active, rolled_back = [], []
+        for run in runs:
+            if not run.get('log_range'):
+                continue
+            start, end = run['log_range']
+            if end > len(data) or _segment_hash(data[start:end]) != run.get('segment_hash'):
+                # The log was edited by hand or replaced: this range can no longer be trusted
+                logging.warning(f"Log segment of run {run['run_id']} changed, ignoring its range")
+                continue
+            (rolled_back if run.get('status') == 'rolled_back' else active).append((start, end))
+        return active, rolled_back
+
+    def _read_entries(self):
+        """Parses the log without the ranges of rolled back runs.
+
+        Returns (int64 values, oversized entries, mask of the int64 values in the range of a run that logged
+        canonical numbers); entries outside such ranges are keyed as national numbers.
+        """
+        with open(self.path, 'rb') as f: data = _complete_lines(f.read())
+        runs = [run for run in self.runs.read() if run.get('status') == 'rolled_back' or run.get('canonical')]
+        canonical, rolled_back = map(set, self._run_ranges(data, runs))
+        cuts = sorted({0, len(data)}.union(*canonical, *rolled_back))
+        pieces = [(start, end) for start, end in zip(cuts, cuts[1:]) if (start, end) not in rolled_back]
+        parsed = [_parse_log_entries(data[start:end]) for start, end in pieces]
+        values = np.concatenate([np.empty(0, dtype=np.int64)] + [piece_values for piece_values, _ in parsed])
+        flags = np.repeat(np.array([piece in canonical for piece in pieces], dtype=bool),
+                          [len(piece_values) for piece_values, _ in parsed])
+        return values, [value for _, piece_oversized in parsed for value in piece_oversized], flags
+
+    def _read(self):
+        """Returns the SortedNumberIndex and KeyedNumbers of the log."""
+        numbers, keyed = SortedNumberIndex(), KeyedNumbers([], *self._key_scheme)
+        if os.path.exists(self.path):
+            try:
+                values, canonical, oversized = _replay_log(*self._read_entries())
+                numbers = SortedNumberIndex(values)
+                numbers.add_many(oversized)
+                keyed = KeyedNumbers(values, *self._key_scheme, canonical)
+                logging.info(f"Loaded {len(numbers)} processed numbers from log.")
+            except Exception as e:
+                logging.error(f"Error reading log file '{self.path}': {e}")
+        return numbers, keyed
+
+    def _write(self, numbers, data, removal=False, run=None, canonical=False):
+        """Queues one append and returns once it is on disk, possibly committed by another thread's batch."""
+        entry = {'numbers': numbers, 'data': data, 'removal': removal, 'run': run, 'canonical': canonical,
+                 'done': False, 'error': None}
+        with self._queue_lock:
+            self._queue.append(entry)
+        with self._lock:
+            if not entry['done']:
+                with self._queue_lock:
+                    batch, self._queue = self._queue, []
+                self._commit(batch)
+        if entry['error'] is not None:
+            raise entry['error']
+
+    def _commit(self, batch):
+        """Appends a batch of queued writes with one fsync. Runs under the lock."""
+        before = self._file_stamp()
+        in_sync = self._numbers is not None and before == self._stamp
+        try:
+            with open(self.path, 'a+b') as f:
+                _truncate_torn_tail(f)
+                position = f.seek(0, os.SEEK_END)
+                for entry in batch:
+                    if entry['run'] is not None:
+                        entry['run']['log_range'] = [position, position + len(entry['data'])]
+                    position += len(entry['data'])
+                f.write(b''.join(entry['data'] for entry in batch))
+                f.flush()
+                os.fsync(f.fileno())
+            self.runs.record(*(entry['run'] for entry in batch if entry['run'] is not None))
+        except Exception as e:
+            for entry in batch:
+                entry['error'], entry['done'] = e, True
+            self._numbers = None
+            self.bloom.discard()
+            return
+        removed, added = 0, []
+        for entry in batch:
+            if in_sync:
+                if entry['removal']:
+                    self._numbers.discard_many(entry['numbers'])
+                    self._keyed.discard_many(entry['numbers'])
+                else:
+                    self._numbers.add_many(entry['numbers'])
+                    self._keyed.add_many(entry['numbers'], entry['canonical'])
+            if entry['removal']:
+                removed += len(entry['numbers'])
+            else:
+                # The Bloom filter holds the numbers and their keys
+                added.extend(entry['numbers'])
+                added.extend(self._keys_of(entry['numbers'], entry['canonical']))
+            entry['done'] = True
+        self._refresh_stamp(before, added)
+        if removed:
+            _pending_tombstones[self.path] = _pending_tombstones.get(self.path, 0) + removed
+
+    def add_many(self, numbers, run_id=None, source=None, canonical=False):
+        """Appends numbers, as one run when run_id is given.
+
+        canonical says the numbers are canonical_numbers output, keyed with their own country code. The log
+        remembers it in the run's journal entry, so it only applies to numbers written by a run.
+        """
+        numbers = _as_numbers(numbers)
+        data = ''.join(f"{number}\n" for number in numbers).encode('ascii')
+        run = None
+        canonical = canonical and bool(run_id)
+        if run_id:
+            run = {'run_id': run_id, 'started_at': time.strftime('%Y-%m-%d %H:%M:%S'), 'source': source,
+                   'output_file': None, 'numbers': len(numbers), 'status': 'active',
+                   'log_range': None, 'segment_hash': _segment_hash(data)}
+            if canonical:
+                run['canonical'] = True
+        self._write(numbers, data, run=run, canonical=canonical)
+
+    def remove_many(self, numbers):
+        numbers_to_remove = set(_as_numbers(numbers))
+        if not numbers_to_remove or not os.path.exists(self.path):
+            return
+        self._write(numbers_to_remove, ''.join(f"-{number}\n" for number in numbers_to_remove).encode('ascii'),
+                    removal=True)
+        if _pending_tombstones.get(self.path, 0) >= TOMBSTONE_COMPACT_THRESHOLD:
+            compact_in_background(self)
+
+    def rollback_run(self, run_id):
+        """Drops everything a run wrote to the log. Returns the updated run, or None if it cannot be rolled back."""
+        run = self.runs.get(run_id)
+        if run is None or run.get('status') == 'rolled_back' or not run.get('log_range'):
+            return None
+        start, end = run['log_range']
+        with self._lock:
+            before = self._file_stamp()
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                if _segment_hash(f.read(end - start)) != run.get('segment_hash'):
+                    logging.warning(f"Log segment of run {run_id} changed, it can no longer be rolled back")
+                    return None
+            run = self.runs.update(run_id, status='rolled_back', rolled_back_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+            # Lookups rebuild the index from the log without the run's range; the filter only gains false positives
+            self._numbers = None
+            self._refresh_stamp(before)
+        logging.info(f"Rolled back run {run_id} ({run['numbers']} numbers)")
+        return run
+
+    def finish_run(self, run_id, **fields):
+        with self._lock:
+            before = self._file_stamp()
+            run = self.runs.update(run_id, **fields)
+            self._refresh_stamp(before)
+        return run
+
+    def list_runs(self):
+        return self.runs.list()
+
+    def compact(self):
+        """Rewrites the log without tombstones, the entries they cancel or rolled back runs.
+
+        Active runs keep their ranges, recomputed for the new file; a no-op when there is nothing to drop.
+        """
+        with self._lock:
+            _pending_tombstones.pop(self.path, None)
+            if not os.path.exists(self.path):
+                return
+            before = self._file_stamp()
+            with open(self.path, 'rb') as f: data = _complete_lines(f.read())
+            runs = self.runs.read()
+            active, rolled_back = self._run_ranges(data, runs)
+            cuts = sorted({0, len(data)}.union(*active, *rolled_back))
+            pieces = [(start, end) for start, end in zip(cuts, cuts[1:]) if (start, end) not in set(rolled_back)]
+            parsed = [_parse_log_entries(data[start:end]) for start, end in pieces]
+            values = np.concatenate([np.empty(0, dtype=np.int64)] + [piece_values for piece_values, _ in parsed])
+            tombstones = int((values < 0).sum()) + sum(value < 0 for _, piece_oversized in parsed for value in piece_oversized)
+            if not tombstones and not rolled_back:
+                return
+            # Survival is decided over the whole log, then each piece keeps its own surviving entries
+            surviving = _surviving_entries(values)
+            surviving_oversized = _surviving_oversized([value for _, piece_oversized in parsed for value in piece_oversized])
+            new_offsets, entry, oversized_entry, chunks, written = {}, 0, 0, [], 0
+            for (start, end), (piece_values, piece_oversized) in zip(pieces, parsed):
+                new_offsets[start] = written
+                kept = piece_values[surviving[entry:entry + len(piece_values)]].tolist()
+                kept += compress(piece_oversized, surviving_oversized[oversized_entry:oversized_entry + len(piece_oversized)])
+                entry += len(piece_values)
+                oversized_entry += len(piece_oversized)
+                chunks.append(''.join(f"{number}\n" for number in kept).encode('ascii'))
+                written += len(chunks[-1])
+                new_offsets[end] = written
+            compacted = b''.join(chunks)
+            active_ranges = set(active)
+            for run in runs:
+                log_range = tuple(run['log_range']) if run.get('log_range') else None
+                if run.get('status') != 'rolled_back' and log_range in active_ranges:
+                    run['log_range'] = [new_offsets[log_range[0]], new_offsets[log_range[1]]]
+                else:
+                    run['log_range'] = run['segment_hash'] = None
+            for run in runs:
+                if run.get('log_range'):
+                    run['segment_hash'] = _segment_hash(compacted[run['log_range'][0]:run['log_range'][1]])
+            replace_file(self.path, compacted)
+            self.runs.replace_all(runs)
+            # Compaction keeps the same set of numbers, so a loaded index stays valid
+            self._refresh_stamp(before)
+        logging.info(f"Compacted log file '{self.path}' ({tombstones} tombstones, {len(rolled_back)} rolled back runs)")
+
+    def _bloom_values(self):
+        numbers = self._loaded()
+        return np.concatenate([numbers.values(), self._keyed.keys()])
+
+    def __contains__(self, number):
+        return bool(self.contains_many([int(number)]))
+
+    def contains_many(self, numbers):
+        """Returns the subset of numbers (kept as given) that are in the log."""
+        # With the Bloom filter on, the index is only loaded once some number may be in the log
+        candidates = self.bloom.candidates(numbers, self._file_stamp, self._bloom_values)
+        return self._loaded().contains_many(candidates) if candidates else set()
+
+    def set_key_scheme(self, country_code, area_code):
+        """Keys the logged numbers for these default codes from now on."""
+        if (country_code, area_code) != self._key_scheme:
+            with self._lock:
+                self._key_scheme = (country_code, area_code)
+
+    def _keyed_numbers(self, keys):
+        """The loaded KeyedNumbers, or None when the Bloom filter rules out every one of keys."""
+        if not self.bloom.candidates(keys.tolist(), self._file_stamp, self._bloom_values):
+            return None
+        self._loaded()
+        return self._keyed
+
+    def _logged_keys(self, keys):
+        keyed = self._keyed_numbers(keys)
+        return keyed.found_keys(keys) if keyed is not None else keys[:0]
+
+    def _logged_forms(self, keys):
+        keyed = self._keyed_numbers(keys)
+        return keyed.forms(keys) if keyed is not None else []
+
+    def equivalence_index(self, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE):
+        """EquivalenceIndex over the keyed array, which is rebuilt for these default codes if it was keyed for others."""
+        self.set_key_scheme(country_code, area_code)
+        index = self._equivalence
+        if index is None or (index.country_code, index.area_code) != (country_code, area_code):
+            index = self._equivalence = EquivalenceIndex(self._logged_keys, self._logged_forms, country_code, area_code)
+        return index
+
+    def __iter__(self):
+        # Numbers in log order; a missing log raises FileNotFoundError like reading it directly would
+        return iter(_surviving_numbers(*self._read_entries()[:2]))
+
+    def __len__(self):
+        return len(self._loaded())
+
+    def __bool__(self):
+        return os.path.exists(self.path) and os.path.getsize(self.path) > 0
+
+    def as_text_file(self):
+        self.compact()
+        return self.path
+
+
+def _bump_generation(conn):
+    conn.execute("UPDATE log_state SET generation = generation + 1")
+
+
+class SQLiteLogStore:
+    """Processed numbers in an indexed SQLite table (WAL mode), migrated from the text log on first use.
+
+    Each row also holds the number's equivalence key (equiv_key, indexed), computed when it is written for the
+    default codes recorded in log_state, and whether it was logged as a canonical number (canonical).
+    """
+
+    def __init__(self, path, legacy_text_path=None, bloom_fp_rate=0):
+        self.path = path
+        self.legacy_text_path = legacy_text_path
+        # Not the text log's journal: rows migrated from it carry no run_id, so its runs cannot be rolled back here
+        self.runs = RunJournal(f"{path}.runs.json")
+        self.bloom = BloomFront(f"{path}.bloom", replace_file, bloom_fp_rate)
+        self._conn = None
+        self._equivalence = None
+        self._wanted_key_scheme = (DEFAULT_COUNTRY_CODE, DEFAULT_AREA_CODE)
+        # The processor kept in the Flask session is used from more than one request thread; the file lock
+        # also orders writers in other processes, which keeps the Bloom filter's stamp checks sound
+        self._lock = file_lock(path)
+
+    def _generation(self, conn):
+        # File stats miss WAL commits that reuse the same WAL bytes, so writers count their commits instead
+        generation = conn.execute("SELECT generation FROM log_state").fetchone()[0]
+        return ((os.stat(self.path).st_ino, generation),)
+
+    def _stamp(self):
+        with self._lock:
+            return self._generation(self._connection())
+
+    def _written(self, before, after, added=()):
+        self.bloom.written(before, after, added)
+
+    def _bloom_values(self):
+        # Numbers and keys, as lookups by either go through the Bloom filter
+        with self._lock:
+            return np.fromiter((value for row in self._connection().execute(
+                "SELECT number, COALESCE(equiv_key, number) FROM processed_numbers") for value in row), dtype=np.int64)
+
+    def _key_scheme(self, conn):
+        """The default codes the stored keys were computed for, or None before the rows are keyed."""
+        country_code, area_code = conn.execute("SELECT key_country_code, key_area_code FROM log_state").fetchone()
+        return None if country_code is None else (country_code, area_code)
+
+    def _rekey(self, conn, country_code, area_code):
+        """Recomputes every row's key for new default codes. Runs in the caller's transaction."""
+        rows = np.array(conn.execute("SELECT number, canonical FROM processed_numbers").fetchall(),
+                        dtype=np.int64).reshape(-1, 2)
+        numbers = rows[:, 0]
+        conn.executemany("UPDATE processed_numbers SET equiv_key = ? WHERE number = ?",
+                         zip(number_keys(numbers, country_code, area_code, rows[:, 1] == 1).tolist(), numbers.tolist()))
+        conn.execute("UPDATE log_state SET key_country_code = ?, key_area_code = ?", (country_code, area_code))
+        _bump_generation(conn)
+        logging.info(f"Computed equivalence keys of {len(numbers)} processed numbers for +{country_code} {area_code}")
+
+    def _connection(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS processed_numbers (number INTEGER PRIMARY KEY, run_id TEXT)")
+            columns = {column[1] for column in conn.execute("PRAGMA table_info(processed_numbers)")}
+            for column, declaration in (('run_id', 'TEXT'), ('equiv_key', 'INTEGER'),
+                                        ('canonical', 'INTEGER NOT NULL DEFAULT 0')):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE processed_numbers ADD COLUMN {column} {declaration}")
+            conn.execute("CREATE INDEX IF NOT EXISTS processed_numbers_run_id ON processed_numbers (run_id)")
+            conn.execute("CREATE INDEX IF NOT EXISTS processed_numbers_equiv_key ON processed_numbers (equiv_key)")
+            conn.execute("CREATE TABLE IF NOT EXISTS log_state (generation INTEGER NOT NULL)")
+            if 'key_country_code' not in {column[1] for column in conn.execute("PRAGMA table_info(log_state)")}:
+                conn.execute("ALTER TABLE log_state ADD COLUMN key_country_code TEXT")
+                conn.execute("ALTER TABLE log_state ADD COLUMN key_area_code TEXT")
+            with conn:
+                conn.execute("INSERT INTO log_state (generation) SELECT 0 WHERE NOT EXISTS (SELECT 1 FROM log_state)")
+            # Databases from before equiv_key have their rows keyed here, once
+            self._apply_key_scheme(conn)
+            self._conn = conn
+            self._migrate_text_log()
+        return self._conn
+
+    def _migrate_text_log(self):
+        legacy_path = self.legacy_text_path
+        if not legacy_path or not os.path.exists(legacy_path):
+            return
+        if self._conn.execute("SELECT 1 FROM processed_numbers LIMIT 1").fetchone():
+            return
+        values, canonical, oversized = _replay_log(*TextLogStore(legacy_path)._read_entries())
+        with self._conn:
+            self._conn.executemany("INSERT OR IGNORE INTO processed_numbers (number, equiv_key, canonical) VALUES (?, ?, ?)",
+                                   self._keyed_rows(self._conn, values.tolist() + oversized,
+                                                    np.append(canonical, np.zeros(len(oversized), dtype=bool))))
+            _bump_generation(self._conn)
+        migrated_path = f"{legacy_path}.migrated"
+        os.replace(legacy_path, migrated_path)
+        logging.info(f"Migrated processed numbers from {legacy_path} to {self.path} (text log kept as {migrated_path})")
+
+    def _keyed_rows(self, conn, numbers, canonical=False):
+        """(number, key, canonical) rows of numbers, keyed for the stored default codes."""
+        fits = np.array([number <= INT64_MAX for number in numbers], dtype=bool)
+        values = np.fromiter((number for (number,) in _sqlite_rows(numbers)), dtype=np.int64)
+        canonical = np.broadcast_to(canonical, fits.shape)[fits]
+        keys = number_keys(values, *self._key_scheme(conn), canonical)
+        return list(zip(values.tolist(), keys.tolist(), canonical.astype(int).tolist()))
+
+    def add_many(self, numbers, run_id=None, source=None, canonical=False):
+        """Inserts numbers, as one run when run_id is given; canonical as for TextLogStore.add_many."""
+        numbers = _as_numbers(numbers)
+        with self._lock:
+            conn = self._connection()
+            before = self._generation(conn)
+            with conn:
+                rows = self._keyed_rows(conn, numbers, canonical)
+                changes = conn.total_changes
+                conn.executemany("INSERT OR IGNORE INTO processed_numbers (number, equiv_key, canonical, run_id) "
+                                 "VALUES (?, ?, ?, ?)", (row + (run_id,) for row in rows))
+                added = conn.total_changes - changes
+                _bump_generation(conn)
+            self._written(before, self._generation(conn), [value for number, key, _ in rows for value in (number, key)])
+        if run_id:
+            self.runs.record({'run_id': run_id, 'started_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+                              'source': source, 'output_file': None, 'numbers': added, 'status': 'active'})
+
+    def remove_many(self, numbers):
+        with self._lock:
+            conn = self._connection()
+            before = self._generation(conn)
+            with conn:
+                conn.executemany("DELETE FROM processed_numbers WHERE number = ?",
+                                 _sqlite_rows(numbers))
+                _bump_generation(conn)
+            self._written(before, self._generation(conn))
+
+    def rollback_run(self, run_id):
+        """Deletes the numbers a run inserted. Returns the updated run, or None if it cannot be rolled back."""
+        run = self.runs.get(run_id)
+        if run is None or run.get('status') == 'rolled_back':
+            return None
+        with self._lock:
+            conn = self._connection()
+            before = self._generation(conn)
+            with conn:
+                conn.execute("DELETE FROM processed_numbers WHERE run_id = ?", (run_id,))
+                _bump_generation(conn)
+            self._written(before, self._generation(conn))
+        run = self.runs.update(run_id, status='rolled_back', rolled_back_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+        logging.info(f"Rolled back run {run_id} ({run['numbers']} numbers)")
+        return run
+
+    def finish_run(self, run_id, **fields):
+        return self.runs.update(run_id, **fields)
+
+    def list_runs(self):
+        return self.runs.list()
+
+    def compact(self):
+        """Folds the write-ahead log back into the database file."""
+        with self._lock:
+            self._connection().execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+    def __contains__(self, number):
+        if int(number) > INT64_MAX or not self.bloom.candidates([int(number)], self._stamp, self._bloom_values):
+            return False
+        with self._lock:
+            return self._connection().execute(
+                "SELECT 1 FROM processed_numbers WHERE number = ?", (int(number),)).fetchone() is not None
+
+    def contains_many(self, numbers):
+        """Returns the subset of numbers (kept as given) that are in the log, looked up in batches."""
+        candidates = self.bloom.candidates(numbers, self._stamp, self._bloom_values)
+        by_value = {int(number): number for number in candidates if int(number) <= INT64_MAX}
+        values = list(by_value)
+        found = set()
+        with self._lock:
+            conn = self._connection()
+            for i in range(0, len(values), SQLITE_BATCH_SIZE):
+                batch = values[i:i + SQLITE_BATCH_SIZE]
+                rows = conn.execute("SELECT number FROM processed_numbers WHERE number IN "
+                                    f"({','.join('?' * len(batch))})", batch)
+                found.update(by_value[number] for (number,) in rows)
+        return found
+
+    def _apply_key_scheme(self, conn):
+        if self._key_scheme(conn) == self._wanted_key_scheme:
+            return
+        with conn:
+            self._rekey(conn, *self._wanted_key_scheme)
+        # The filter holds the old keys; its stamp no longer matches, so the next lookup rebuilds it
+        self.bloom.discard()
+
+    def set_key_scheme(self, country_code, area_code):
+        """Keys the logged numbers for these default codes, recomputing the stored keys if they were for others.
+
+        Applied when the database is first opened, so processors that only parse never touch it.
+        """
+        with self._lock:
+            self._wanted_key_scheme = (country_code, area_code)
+            if self._conn is not None:
+                self._apply_key_scheme(self._conn)
+
+    def _by_key(self, column, keys):
+        """column of the rows whose equiv_key is one of keys, looked up in batches after the Bloom filter."""
+        keys = self.bloom.candidates(keys.tolist(), self._stamp, self._bloom_values)
+        found = []
+        with self._lock:
+            conn = self._connection()
+            for i in range(0, len(keys), SQLITE_BATCH_SIZE):
+                batch = keys[i:i + SQLITE_BATCH_SIZE]
+                found.extend(value for (value,) in conn.execute(
+                    f"SELECT {column} FROM processed_numbers WHERE equiv_key IN ({','.join('?' * len(batch))})", batch))
+        return found
+
+    def _logged_keys(self, keys):
+        return np.array(self._by_key('DISTINCT equiv_key', keys), dtype=np.int64)
+
+    def _logged_forms(self, keys):
+        return self._by_key('number', keys)
+
+    def equivalence_index(self, country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE):
+        """EquivalenceIndex over the equiv_key column, which is recomputed for these default codes if it was for others."""
+        self.set_key_scheme(country_code, area_code)
+        index = self._equivalence
+        if index is None or (index.country_code, index.area_code) != (country_code, area_code):
+            index = self._equivalence = EquivalenceIndex(self._logged_keys, self._logged_forms, country_code, area_code)
+        return index
+
+    def __iter__(self):
+        with self._lock:
+            numbers = [number for (number,) in self._connection().execute("SELECT number FROM processed_numbers")]
+        return iter(numbers)
+
+    def __len__(self):
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM processed_numbers").fetchone()[0]
+
+    def __bool__(self):
+        with self._lock:
+            return self._connection().execute("SELECT 1 FROM processed_numbers LIMIT 1").fetchone() is not None
+
+    def as_text_file(self):
+        """Writes the numbers to a text file next to the database, for viewing in an editor."""
+        export_path = os.path.splitext(self.path)[0] + '_lista.txt'
+        with open(export_path, 'w', encoding='utf-8') as f:
+            f.writelines(f"{number}\n" for number in self)
+        return export_path
+
+
+LOG_BACKENDS = ('text', 'sqlite')
+
+
+_stores = {}
+_stores_guard = threading.Lock()
+
+
+def open_log_store(log_file_path, backend='text', bloom_fp_rate=0, country_code=DEFAULT_COUNTRY_CODE,
+                   area_code=DEFAULT_AREA_CODE):
+    """Returns the process-wide store for a log, so its index or connection outlives single requests.
+
+    bloom_fp_rate between 0 and 1 puts a persisted Bloom filter with that false-positive rate in front of it.
+    country_code and area_code are the defaults the numbers' equivalence keys are computed for.
+    """
+    if backend not in LOG_BACKENDS:
+        logging.warning(f"Unknown log backend '{backend}', using the text log")
+        backend = 'text'
+    key = (os.path.normcase(os.path.abspath(log_file_path)), backend)
+    with _stores_guard:
+        store = _stores.get(key)
+        if store is None:
+            if backend == 'sqlite':
+                store = SQLiteLogStore(os.path.splitext(log_file_path)[0] + '.sqlite3', legacy_text_path=log_file_path)
+            else:
+                store = TextLogStore(log_file_path)
+            _stores[key] = store
+        store.bloom.fp_rate = bloom_fp_rate
+    store.set_key_scheme(country_code, area_code)
+    return store
+
+
+def compact_in_background(store):
+    thread = threading.Thread(target=_compact_quietly, args=(store,), daemon=True)
+    thread.start()
+    return thread
+
+
+def _compact_quietly(store):
+    try:
+        store.compact()
+    except Exception as e:
+        logging.error(f"Log compaction failed: {e}", exc_info=True)
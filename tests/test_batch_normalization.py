@@ -0,0 +1,37 @@
+import random
+import pytest
+from vcf_extractor import VCFProcessor
+
+EDGE_NAMES = [None, '', '  ', 'Dr.', 'Avó Rosa', 'Irmã', 'Dona Maria Clara', '😀 Zé', 'Ｊｏｓé', 'a\x00b', 'Çamlı', '123 Ana',
+              'Dr Avó', 'Ana']
+EDGE_NUMBERS = [None, '', 'abc', '+55 (11) 9 8765-4321', '١٢٣٤٥', '１２３', '12\x0034', 'tel:+1-800', '٣3x', '²³', '9' * 40,
+                '+55 11 ９８', '11 98765-4321', '8765-4321']
+
+
+@pytest.fixture
+def processor(tmp_path):
+    return VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=['Dr', 'Avó', 'Irmã', 'Dona Maria'])
+
+
+def _per_row(processor, names, numbers):
+    return [processor._clean_name(name) for name in names], [processor._clean_phone_number(number) for number in numbers]
+
+
+def test_edge_cases_match_per_row_cleaning(processor):
+    # NUL bytes, non-ASCII digits and None must not shift or change any row
+    assert processor.normalize_columns(EDGE_NAMES, EDGE_NUMBERS) == _per_row(processor, EDGE_NAMES, EDGE_NUMBERS)
+    assert processor.normalize_columns([], []) == ([], [])
+
+
+def test_random_columns_match_per_row_cleaning(processor):
+    rng = random.Random(0)
+    pool = ['João', 'Maria', 'Dr', 'Avó', 'Irmã', 'Ｚé', '', None] + [f'Nome{i}' for i in range(300)]
+    names = [' '.join(str(rng.choice(pool) or '') for _ in range(rng.randint(1, 3))) if rng.random() > 0.01 else None
+             for _ in range(20_000)]
+    # A NUL in any number sends the whole column down the per-row path, so this one keeps to the vectorized path
+    odd_numbers = [number for number in EDGE_NUMBERS if not number or '\x00' not in number]
+    numbers = [rng.choice(odd_numbers) if rng.random() < 0.05 else f'+55 (11) 9{rng.randrange(10 ** 8):08d}'
+               for _ in range(20_000)]
+    expected = _per_row(processor, names, numbers)
+    processor.title_matcher._memo.clear()
+    assert processor.normalize_columns(names, numbers) == expected
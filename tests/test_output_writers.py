@@ -0,0 +1,10 @@
+import pandas as pd
+from output_writers import write_xlsx
+
+
+def test_xlsx_layout_matches_to_excel(tmp_path):
+    rows = [(5511988881111, 'Ana'), (5521977772222, ''), (5531966663333, 'José')]
+    assert write_xlsx(str(tmp_path / 'streamed.xlsx'), iter(rows)) == 3
+    pd.DataFrame(rows, columns=['Number', 'Name']).to_excel(tmp_path / 'frame.xlsx', index=False, engine='openpyxl')
+    streamed, frame = pd.read_excel(tmp_path / 'streamed.xlsx'), pd.read_excel(tmp_path / 'frame.xlsx')
+    assert streamed.equals(frame) and streamed['Number'].dtype == 'int64'
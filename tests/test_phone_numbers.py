@@ -0,0 +1,69 @@
+from contact import Contact
+from phone_numbers import canonical_numbers, equivalence_keys
+from vcf_extractor import VCFProcessor
+
+
+def test_plus_numbers_keep_their_own_country_code(tmp_path):
+    processor = VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=[])
+    assert processor._clean_phone_number('+7 991 234-56-78') == '79912345678'
+    assert processor._clean_phone_number('+33 9 12 34 56 78') == '33912345678'
+    assert processor._clean_phone_number('+49 89 123456') == '4989123456'
+    assert processor._clean_phone_number('tel:+1-212-555-1234') == '12125551234'
+    assert processor._clean_phone_number('+55 (11) 9 8765-4321') == '5511987654321'
+    # Only a leading + counts; written without one, the default country and area codes apply
+    assert processor._clean_phone_number('55 +11 98765-4321') == '5511987654321'
+    assert processor._clean_phone_number('(11) 98765-4321') == '5511987654321'
+    assert processor._clean_phone_number('8765-4321') == '551187654321'
+
+
+def test_double_zero_prefix_is_international():
+    assert canonical_numbers(['004989123456', '0079912345678', '00551198765432']) == \
+        ['4989123456', '79912345678', '551198765432']
+    # A single 0 is the national long-distance prefix, followed by a carrier code
+    assert canonical_numbers(['0211198765432']) == ['551198765432']
+
+
+def test_batch_path_detects_plus_like_per_row(tmp_path):
+    processor = VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=[])
+    numbers = ['+7 991 234-56-78', ' +49 89 123456', '(+33) 9 12 34 56 78', '11 +98765-4321', '+', '', None, '+٣4']
+    assert processor.normalize_columns([''] * len(numbers), numbers)[1] == \
+        [processor._clean_phone_number(number) for number in numbers]
+
+
+def test_canonical_foreign_numbers_are_not_equivalent_to_national_look_alikes():
+    # 79912345678 is +7 991 234-56-78 once canonical, not the Brazilian (79) 91234-5678
+    russian, brazilian = equivalence_keys(['79912345678', '5579912345678'], international=True).tolist()
+    assert russian != brazilian
+    # A legacy 8-digit mobile still matches its 9-digit form
+    legacy, mobile = equivalence_keys(['551187654321', '5511987654321'], international=True).tolist()
+    assert legacy == mobile
+
+
+def test_reprocessing_removes_only_equivalent_logged_forms(tmp_path):
+    processor = VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=[])
+    processor.processed_log.add_many([5579912345678], run_id='run-1', canonical=True)
+    processor.processed_log.add_many([1187654321])
+    # Cleaned numbers are canonical: +7 991 234-56-78 is not the Brazilian (79) 91234-5678
+    processor.remove_from_log(['79912345678'])
+    assert 5579912345678 in processor.processed_log
+    processor.remove_from_log(['5511987654321'])
+    assert 1187654321 not in processor.processed_log
+
+
+def test_text_export_numbers_are_international_only_with_a_plus(tmp_path):
+    processor = VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=[])
+    contacts = processor._extract_contacts_from_text(
+        "Name: Ana\nNumber (1): (11) 98765-4321\nName: Ivan\nNumber (1): +7 991 234-56-78\n")
+    assert [processor._clean_phone_number(contact['number']) for contact in contacts] == \
+        ['5511987654321', '79912345678']
+
+
+def test_merged_equivalent_contacts_keep_the_canonical_number(tmp_path):
+    processor = VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=[])
+    contacts = [Contact(name, number, processor._clean_phone_number(number), name)
+                for name, number in [('Ana', '+55 11 98765-4321'), ('Ana Maria Souza', '+55 11 8765-4321')]]
+    unique, duplicates = processor._sort_normalized_contacts(contacts)
+    assert duplicates == [] and [(contact.original_name, contact.cleaned_number) for contact in unique] == \
+        [('Ana Maria Souza', '5511987654321')]
+    processor.process_and_save(unique, str(tmp_path / 'out'), 'contatos')
+    assert set(processor.processed_log) == {5511987654321}
@@ -0,0 +1,123 @@
+import random
+import sqlite3
+import pytest
+from phone_numbers import equivalence_keys
+from processed_log import SortedNumberIndex, TextLogStore, SQLiteLogStore, INT64_MAX
+
+
+def test_sorted_index_matches_a_set():
+    rng = random.Random(1)
+    index, reference = SortedNumberIndex(), set()
+    for _ in range(300):
+        numbers = [rng.randrange(1, 20_000) for _ in range(rng.randrange(1, 200))]
+        if rng.random() < 0.6:
+            index.add_many(numbers)
+            reference.update(numbers)
+        else:
+            index.discard_many(numbers)
+            reference.difference_update(numbers)
+        candidates = [str(rng.randrange(1, 21_000)) for _ in range(100)]
+        assert index.contains_many(candidates) == {number for number in candidates if int(number) in reference}
+        assert len(index) == len(reference)
+
+
+def test_numbers_beyond_int64_are_not_clamped(tmp_path):
+    path = tmp_path / 'NAO_APAGAR.log'
+    path.write_text(f"5511988881111\n{'9' * 25}\n", encoding='utf-8')
+    store = TextLogStore(str(path))
+    assert int('9' * 25) in store and '5511988881111' in store
+    assert INT64_MAX not in store
+
+
+def test_sqlite_runs_are_separate_from_migrated_text_runs(tmp_path):
+    text_path = str(tmp_path / 'NAO_APAGAR.log')
+    text = TextLogStore(text_path)
+    text.add_many(['5511911110000'], run_id='text-run')
+    store = SQLiteLogStore(str(tmp_path / 'NAO_APAGAR.sqlite3'), legacy_text_path=text_path)
+    assert '5511911110000' in store
+    assert store.list_runs() == [] and store.rollback_run('text-run') is None
+    store.add_many(['5511922220000'], run_id='sqlite-run')
+    assert [run['run_id'] for run in store.list_runs()] == ['sqlite-run']
+    assert store.rollback_run('sqlite-run')['status'] == 'rolled_back'
+    assert '5511922220000' not in store and '5511911110000' in store
+
+
+def test_last_number_without_newline_is_kept(tmp_path):
+    path = tmp_path / 'NAO_APAGAR.log'
+    path.write_bytes(b"5511911110000\n5511922220000")
+    assert set(TextLogStore(str(path))) == {5511911110000, 5511922220000}
+    store = TextLogStore(str(path))
+    store.add_many(['5511933330000'])
+    assert path.read_bytes() == b"5511911110000\n5511922220000\n5511933330000\n"
+
+
+def test_torn_append_is_dropped(tmp_path):
+    path = tmp_path / 'NAO_APAGAR.log'
+    path.write_bytes(b"5511911110000\n-55119")
+    assert set(TextLogStore(str(path))) == {5511911110000}
+    TextLogStore(str(path)).add_many(['5511933330000'])
+    assert path.read_bytes() == b"5511911110000\n5511933330000\n"
+
+
+@pytest.mark.parametrize('backend', ['text', 'sqlite'])
+def test_equivalent_forms_follow_the_stores_writes(tmp_path, backend):
+    path = str(tmp_path / 'NAO_APAGAR.log')
+    store = TextLogStore(path, bloom_fp_rate=0.01) if backend == 'text' else \
+        SQLiteLogStore(str(tmp_path / 'NAO_APAGAR.sqlite3'), bloom_fp_rate=0.01)
+    index = store.equivalence_index('55', '11')
+    # National, legacy 8-digit and E.164 forms of the same two phones
+    store.add_many([11987654321, 551187650000])
+    assert index.contains_many(['5511987654321', '5511987650000', '5511900000000']) == {'5511987654321', '5511987650000'}
+    assert index.logged_forms(['87654321']) == {11987654321}
+    store.add_many([5511987654321])
+    store.remove_many([11987654321])
+    assert index.logged_forms(['11987654321']) == {5511987654321}
+    store.remove_many([5511987654321])
+    assert index.contains_many(['5511987654321']) == set()
+    # Other default codes re-key what is logged
+    store.add_many([87654321])
+    assert store.equivalence_index('55', '21').contains_many(['5521987654321']) == {'5521987654321'}
+
+
+@pytest.mark.parametrize('backend', ['text', 'sqlite'])
+def test_numbers_logged_by_runs_are_keyed_as_canonical(tmp_path, backend):
+    def open_store():
+        return TextLogStore(str(tmp_path / 'NAO_APAGAR.log'), bloom_fp_rate=0.01) if backend == 'text' else \
+            SQLiteLogStore(str(tmp_path / 'NAO_APAGAR.sqlite3'), bloom_fp_rate=0.01)
+    store = open_store()
+    # +7 991 234-56-78 as a run writes it, next to the same digits imported as a national number
+    store.add_many([79912345678], run_id='run-1', canonical=True)
+    store.add_many([2187654321])
+    brazilian = ['5579912345678', '5521987654321']
+    for store in (store, open_store()):
+        index = store.equivalence_index('55', '11')
+        assert index.contains_many(brazilian, equivalence_keys(brazilian, international=True)) == {'5521987654321'}
+        assert index.logged_forms(['79912345678'], international=True) == {79912345678}
+    if backend == 'text':
+        store.compact()
+        assert open_store().equivalence_index('55', '11').contains_many(['5579912345678']) == set()
+
+
+def test_sqlite_log_from_before_equiv_key_is_keyed(tmp_path):
+    path = str(tmp_path / 'NAO_APAGAR.sqlite3')
+    with sqlite3.connect(path) as conn:
+        conn.execute("CREATE TABLE processed_numbers (number INTEGER PRIMARY KEY, run_id TEXT)")
+        conn.execute("CREATE TABLE log_state (generation INTEGER NOT NULL)")
+        conn.execute("INSERT INTO log_state VALUES (3)")
+        conn.executemany("INSERT INTO processed_numbers (number) VALUES (?)", [(1187654321,), (5521999990000,)])
+    conn.close()
+    store = SQLiteLogStore(path)
+    assert store.equivalence_index().contains_many(['5511987654321', '21999990000']) == {'5511987654321', '21999990000'}
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*) FROM processed_numbers WHERE equiv_key IS NULL").fetchone()[0] == 0
+    conn.close()
+
+
+def test_non_numeric_lines_do_not_hide_later_numbers(tmp_path):
+    path = tmp_path / 'NAO_APAGAR.log'
+    path.write_bytes(b"5511911110000\n-5511911110000\nligar depois\n55 11 9\n5511922220000\n")
+    assert set(TextLogStore(str(path))) == {5511922220000}
+    store = TextLogStore(str(path))
+    assert '5511922220000' in store and '55' not in store and '5511911110000' not in store
+    store.compact()
+    assert path.read_bytes() == b"5511922220000\n"
@@ -0,0 +1,115 @@
+"""Parallel clients against a local server, plus direct writers in other processes, all on one text log.
+
+Opt-in, as it takes a while: VCF_STRESS_TEST=1 python -m pytest tests/test_stress.py
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import subprocess
+import multiprocessing
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+
+pytestmark = pytest.mark.skipif(not os.environ.get('VCF_STRESS_TEST'), reason='set VCF_STRESS_TEST=1 to run')
+
+HTTP_PROCESSES, WRITER_PROCESSES, THREADS, ROUNDS = 3, 2, 8, 20
+SERVER = """
+import os
+from werkzeug.serving import make_server
+import app
+server = make_server('127.0.0.1', 0, app.app, threaded=True)
+with open('server.port.tmp', 'w') as f: f.write(str(server.server_port))
+os.replace('server.port.tmp', 'server.port')
+server.serve_forever()
+"""
+
+
+def _batches(client):
+    """(numbers added, numbers then removed) for every round of one client; clients never share numbers."""
+    for round_number in range(ROUNDS):
+        base = 10_000_000 + client * 100_000 + round_number * 100
+        yield range(base, base + 50), range(base, base + 50, 5)
+
+
+def _expected(clients):
+    return {number for client in clients for added, removed in _batches(client) for number in set(added) - set(removed)}
+
+
+def _post(url, payload):
+    request = urllib.request.Request(url, json.dumps(payload).encode('utf-8'), {'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request) as response:
+        assert response.status == 200
+
+
+def _http_clients(url, clients):
+    def client(number):
+        for added, removed in _batches(number):
+            _post(f"{url}/add_processed_numbers", {'numbers': list(added)})
+            _post(f"{url}/remove_processed_numbers", {'numbers': list(removed)})
+    with ThreadPoolExecutor(len(clients)) as pool:
+        list(pool.map(client, clients))
+
+
+def _direct_writers(log_path, clients):
+    from processed_log import open_log_store, new_run_id
+    store = open_log_store(log_path)
+
+    def writer(number):
+        for added, removed in _batches(number):
+            store.add_many(added, run_id=new_run_id(), source=f"writer {number}")
+            store.remove_many(removed)
+    with ThreadPoolExecutor(len(clients)) as pool:
+        list(pool.map(writer, clients))
+
+
+def _start_server(directory):
+    """Runs a copy of the app in its own process, so its config.ini, logs and NAO_APAGAR.log stay in directory."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for name in os.listdir(root):
+        if name.endswith('.py'):
+            shutil.copy(os.path.join(root, name), directory)
+    for name in ('templates', 'static'):
+        shutil.copytree(os.path.join(root, name), os.path.join(directory, name))
+    server = subprocess.Popen([sys.executable, '-c', SERVER], cwd=directory, stdout=subprocess.DEVNULL)
+    port_path = os.path.join(directory, 'server.port')
+    deadline = time.monotonic() + 60
+    while not os.path.exists(port_path):
+        assert server.poll() is None and time.monotonic() < deadline, 'the app server did not start'
+        time.sleep(0.1)
+    with open(port_path) as f:
+        return server, f"http://127.0.0.1:{f.read()}"
+
+
+def test_parallel_clients_keep_every_write(tmp_path):
+    pytest.importorskip('webview')
+    import processed_log
+    server, url = _start_server(str(tmp_path))
+    log_path = str(tmp_path / 'NAO_APAGAR.log')
+    http_clients = [list(range(p * THREADS, (p + 1) * THREADS)) for p in range(HTTP_PROCESSES)]
+    writer_clients = [list(range(1000 + p * THREADS, 1000 + (p + 1) * THREADS)) for p in range(WRITER_PROCESSES)]
+    processes = [multiprocessing.Process(target=_http_clients, args=(url, clients)) for clients in http_clients]
+    processes += [multiprocessing.Process(target=_direct_writers, args=(log_path, clients)) for clients in writer_clients]
+    try:
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        with urllib.request.urlopen(f"{url}/get_processed_numbers") as response:
+            served = set(json.load(response)['numbers'])
+    finally:
+        server.terminate()
+        server.wait()
+    assert all(process.exitcode == 0 for process in processes)
+    expected = _expected(sum(http_clients + writer_clients, []))
+    assert served == expected
+    assert set(processed_log.TextLogStore(log_path)) == expected
+    # Every run's byte range still holds exactly what the run wrote
+    runs = processed_log.TextLogStore(log_path).list_runs()
+    assert len(runs) == WRITER_PROCESSES * THREADS * ROUNDS
+    with open(log_path, 'rb') as f:
+        data = f.read()
+    assert all(processed_log._segment_hash(data[run['log_range'][0]:run['log_range'][1]]) == run['segment_hash']
+               for run in runs)
@@ -0,0 +1,36 @@
+from title_matcher import TitleMatcher
+
+TITLES = ["Avó", "Irmã", "Mãe", "Dr", "Dra", "Sítio", "Dona", "Dona Maria", "Tio Zé"]
+
+
+def test_accented_titles_are_removed():
+    matcher = TitleMatcher(TITLES)
+    assert matcher.clean_name("Avó Maria") == "Maria"
+    assert matcher.clean_name("Irmã Joana") == "Joana"
+    assert matcher.clean_name("Sítio Boa Vista") == "Boa"
+    # Names are folded the same way, so unaccented spellings match too
+    assert matcher.clean_name("avo maria") == "Maria"
+
+
+def test_name_made_only_of_titles_is_empty():
+    matcher = TitleMatcher(TITLES)
+    assert matcher.clean_name("Mãe") == ""
+    assert matcher.clean_name("Dr. Avó") == ""
+
+
+def test_multi_word_and_longest_titles():
+    matcher = TitleMatcher(TITLES)
+    assert matcher.first_word("Tio Zé Carlos") == "Carlos"
+    # "Tio" alone is not a title
+    assert matcher.first_word("Tio Carlos") == "Tio"
+    # "Dona Maria" wins over "Dona" where both match
+    assert matcher.first_word("Dona Maria Rosa") == "Rosa"
+    assert matcher.first_word("Dona Rosa") == "Rosa"
+    assert matcher.first_word("DRA. Ana Paula") == "Ana"
+
+
+def test_titles_match_whole_words_only():
+    matcher = TitleMatcher(TITLES)
+    assert matcher.first_word("Drum Silva") == "Drum"
+    assert matcher.first_word("Avóvó") == "Avovo"
+
@@ -0,0 +1,47 @@
+import vcf_extractor
+from vcf_extractor import VCFProcessor
+
+
+def _extract(tmp_path, *cards):
+    processor = VCFProcessor(str(tmp_path / 'NAO_APAGAR.log'), titles_to_remove=[])
+    return processor._extract_contact_data(''.join(f"BEGIN:VCARD\n{card}\nEND:VCARD\n" for card in cards))
+
+
+def test_tel_uri_values(tmp_path):
+    contacts = _extract(tmp_path,
+                        "VERSION:4.0\nFN:Ana\nTEL;VALUE=uri;TYPE=cell:tel:+55-11-98888-1111",
+                        "VERSION:4.0\nFN:Bia\nTEL;VALUE=uri:TEL:+55 21 97777-2222;ext=12")
+    assert contacts == [{'name': 'Ana', 'number': '+5511988881111'}, {'name': 'Bia', 'number': '+5521977772222'}]
+
+
+def test_property_priority(tmp_path):
+    contacts = _extract(tmp_path,
+                        "N:Souza;Caio;;;\nTEL;TYPE=CELL:(11) 9999-0000\nX-PHONE:5511987654321",
+                        "FN:Dora\nitem1.TEL;waid=5511912345678:+55 11 91234-5678",
+                        "FN:Eva\nTEL:123\nX-WA-BIZ-NAME:Loja 5511955554444",
+                        "FN:Sem numero\nTEL:12-34")
+    assert contacts == [{'name': 'Souza', 'number': '5511987654321'},
+                        {'name': 'Dora', 'number': '+5511912345678'},
+                        {'name': 'Eva', 'number': '5511955554444'}]
+
+
+def test_parallel_parse_matches_the_serial_path(tmp_path, monkeypatch):
+    path = tmp_path / 'contatos.vcf'
+    path.write_text(''.join(f"BEGIN:VCARD\nVERSION:3.0\nFN:Dr. Contato {i}\nTEL:+55 11 9{i:04d}-{i % 7:04d}\nEND:VCARD\n"
+                            for i in range(3000)), encoding='utf-8')
+    monkeypatch.setattr(vcf_extractor, 'PARALLEL_MIN_FILE_SIZE', 0)
+    parallel_results = []
+    parse_vcf_parallel = VCFProcessor._parse_vcf_parallel
+    def spy(self, *args):
+        parallel_results.append(parse_vcf_parallel(self, *args))
+        return parallel_results[-1]
+    monkeypatch.setattr(VCFProcessor, '_parse_vcf_parallel', spy)
+
+    def parse(workers):
+        processor = VCFProcessor(str(tmp_path / f'NAO_APAGAR_{workers}.log'), titles_to_remove=['Dr.'])
+        return [[contact.to_dict() for contact in contacts]
+                for contacts in processor.get_unique_and_duplicate_contacts(str(path), workers=workers)]
+    serial = parse(1)
+    assert len(serial[0]) == 3000 and parallel_results == []
+    assert parse(2) == serial
+    assert parallel_results and parallel_results[0] is not None
@@ -0,0 +1,89 @@
+import re
+import threading
+from collections import OrderedDict
+from unidecode import unidecode
+
+_NON_ALNUM = re.compile(r'[^a-zA-Z0-9\s]+')
+# Key marking the trie node where a complete title ends
+_END = ''
+# Cleaned names remembered per title list; group exports repeat the same few thousand first names
+NAME_MEMO_SIZE = 100_000
+
+
+def fold(text):
+    """ASCII-folds text the way names are cleaned: unidecode, then only letters, digits and whitespace."""
+    return _NON_ALNUM.sub('', unidecode(text))
+
+
+class TitleMatcher:
+    """Titles folded like names and kept as a trie of lowercase words, so "Avó" and "Irmã" match the
+    ASCII-folded "Avo" and "Irma", and multi-word titles like "Dona Maria" work too.
+
+    first_word() walks a name's words once, skipping every title it starts at (the longest one when
+    titles overlap), and stops at the first word that isn't part of a title.
+    """
+
+    def __init__(self, titles, memo_size=NAME_MEMO_SIZE):
+        self.trie = {}
+        # raw name -> cleaned name, least recently used first
+        self._memo = OrderedDict()
+        self._memo_size = memo_size
+        self._memo_lock = threading.Lock()
+        self.memo_changed = False
+        # Set by the owner once a saved memo has been loaded into this one
+        self.memo_loaded = False
+        for title in titles:
+            words = fold(title).lower().split()
+            if not words:
+                continue
+            node = self.trie
+            for word in words:
+                node = node.setdefault(word, {})
+            node[_END] = True
+
+    def _title_length(self, words, start):
+        node, length = self.trie, 0
+        for i in range(start, len(words)):
+            node = node.get(words[i].lower())
+            if node is None:
+                break
+            if _END in node:
+                length = i - start + 1
+        return length
+
+    def first_word(self, name):
+        """First word of the folded name outside any title, or "" when there is none."""
+        words = fold(name).split()
+        i = 0
+        while i < len(words):
+            length = self._title_length(words, i)
+            if not length:
+                return words[i]
+            i += length
+        return ""
+
+    def clean_name(self, name):
+        """first_word(name) title-cased, memoized so each distinct raw name is cleaned once per title list."""
+        with self._memo_lock:
+            cleaned = self._memo.get(name)
+            if cleaned is not None:
+                self._memo.move_to_end(name)
+                return cleaned
+        cleaned = self.first_word(name).title()
+        self.remember([(name, cleaned)])
+        return cleaned
+
+    def remember(self, pairs):
+        """Adds (raw name, cleaned name) pairs to the memo, e.g. loaded from disk or cleaned by parse workers."""
+        with self._memo_lock:
+            for name, cleaned in pairs:
+                if name not in self._memo:
+                    self.memo_changed = True
+                self._memo[name] = cleaned
+                self._memo.move_to_end(name)
+            while len(self._memo) > self._memo_size:
+                self._memo.popitem(last=False)
+
+    def memo_items(self):
+        with self._memo_lock:
+            return list(self._memo.items())
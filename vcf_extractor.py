@@ -1,13 +1,26 @@
 import io
 import os
+import codecs
+import mmap
 import sys
 import re
-import pandas as pd
-from unidecode import unidecode
 import configparser
 import json
 import ast
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain, repeat, islice
+from functools import lru_cache
+import hashlib
+import numpy as np
+from parse_cache import titles_version
+from processed_log import open_log_store, new_run_id, file_lock, replace_file
+from output_transaction import OutputTransaction
+from title_matcher import TitleMatcher
+from phone_numbers import canonical_numbers, equivalence_keys, phone_defaults, DEFAULT_COUNTRY_CODE, DEFAULT_AREA_CODE
+from contact import Contact, CONTACT_FIELDS
+from output_writers import (OUTPUT_FORMATS, DEFAULT_OUTPUT_FORMAT, PARALLEL_OUTPUT_FORMATS, output_format_error,
+                            bundle_files)
 
 # Configure logging for PyInstaller builds
 if getattr(sys, 'frozen', False):
@@ -25,6 +38,160 @@ logging.basicConfig(
     ]
 )
 
+# Size of each read from disk; VCF files are parsed as a stream and never loaded whole
+VCF_READ_CHUNK_SIZE = 1024 * 1024
+
+# Encoding is decided once from this many leading bytes, then the file is decoded in a single pass
+ENCODING_SNIFF_SIZE = 64 * 1024
+# UTF-32 BOMs first: the UTF-32-LE BOM starts with the UTF-16-LE one
+BYTE_ORDER_MARKS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+CHARSET_PARAM_RE = re.compile(rb'CHARSET=([A-Za-z0-9_\-]+)', re.IGNORECASE)
+
+# RFC 6350 3.2: a line starting with whitespace continues the previous one
+FOLDED_LINE_RE = re.compile(r'\r?\n[ \t]')
+
+def _any_case(word):
+    # Case-insensitive by character class: re.IGNORECASE slows the whole scan down noticeably
+    return ''.join(f'[{c.upper()}{c.lower()}]' if c.isalpha() else re.escape(c) for c in word)
+
+# One pass over the text (or the raw bytes, see CARD_TOKEN_BYTES_RE) finds the card boundaries
+# and only the property lines a contact is built from. Each kind of line closes a different
+# group, so match.lastindex says what was found and match.group(lastindex) is its value,
+# still folded (N yields just the family name); for phone properties group(lastindex - 1)
+# holds the parameters. Lines are anchored on a literal newline, which the regex engine can
+# skip to much faster than a MULTILINE ^.
+_FOLDED_TAIL = r'(?:\n[ \t][^\n]*)*'
+# Binary properties (embedded photos, logos, sounds, keys) are consumed whole in one match:
+# their folded lines, then any lines made only of base64 characters, which covers the
+# unindented payload and closing blank line of vCard 2.1. The next property line always has
+# a colon, which base64 never contains.
+_BINARY_PROPERTY = (
+    rf'(?:{_any_case("PHOTO")}|{_any_case("LOGO")}|{_any_case("SOUND")}|{_any_case("KEY")})'
+    r'[^:\n]*:[^\n]*(?:\n[ \t][^\n]*)*(?:\r?\n[A-Za-z0-9+/=]*(?=\r?\n|\Z))*'
+)
+CARD_TOKEN_PATTERN = (
+    r'\n(?:[A-Za-z0-9-]+\.)?(?:'
+    r'(BEGIN:VCARD)'
+    r'|(END:VCARD)'
+    rf'|{_any_case("FN")}(?:;[^:\n]*)?:(.*{_FOLDED_TAIL})'
+    rf'|{_any_case("N")}(?:;[^:\n]*)?:([^;\n]*)'
+    rf'|{_any_case("NICKNAME")}(?:;[^:\n]*)?:(.*{_FOLDED_TAIL})'
+    rf'|{_any_case("TEL")}((?:;[^:\n]*)?):(.*{_FOLDED_TAIL})'
+    rf'|[A-Za-z0-9-]*{_any_case("PHONE")}[A-Za-z0-9-]*((?:;[^:\n]*)?):(.*{_FOLDED_TAIL})'
+    rf'|{_any_case("X-WA-BIZ-NAME")}[A-Za-z0-9-]*((?:;[^:\n]*)?):(.*{_FOLDED_TAIL})'
+    rf'|({_BINARY_PROPERTY})'
+    r')'
+)
+CARD_TOKEN_RE = re.compile(CARD_TOKEN_PATTERN)
+# Same tokens matched directly on a memory-mapped file, so nothing but the values is decoded
+CARD_TOKEN_BYTES_RE = re.compile(CARD_TOKEN_PATTERN.encode('ascii'))
+TOKEN_BEGIN, TOKEN_END, TOKEN_FN, TOKEN_N, TOKEN_NICKNAME = 1, 2, 3, 4, 5
+TOKEN_TEL, TOKEN_PHONE, TOKEN_BIZ_NAME, TOKEN_BINARY = 7, 9, 11, 12
+TEL_VALUE_RE = re.compile(r'[+]?\d[\d\s\-\(\)]+')
+WAID_PARAM_RE = re.compile(r'waid=([^:;\s]+)', re.IGNORECASE)
+BIZ_NAME_NUMBER_RE = re.compile(r'[+]?\d{10,15}')
+NON_PHONE_CHARS_RE = re.compile(r'[^\d+]')
+PLUS_OR_DIGIT_RE = re.compile(r'[+\d]')
+TEL_PUNCTUATION_TABLE = str.maketrans('', '', '-()')
+
+def _unfold(value):
+    return FOLDED_LINE_RE.sub('', value) if '\n' in value else value
+
+def _phone_candidate(raw_value):
+    cleaned = NON_PHONE_CHARS_RE.sub('', raw_value)
+    return cleaned if len(cleaned) >= 10 else None
+
+def _tel_candidate(value):
+    # vCard 4.0 writes TEL;VALUE=uri values as tel: URIs (RFC 3966)
+    if value[:4].lower() == 'tel:':
+        value = value[4:]
+    tel_match = TEL_VALUE_RE.match(value)
+    if not tel_match:
+        return None
+    # TEL_VALUE_RE only lets digits, '+', whitespace and '-()' through, so no regex is needed here
+    cleaned = ''.join(tel_match.group(0).translate(TEL_PUNCTUATION_TABLE).split())
+    return cleaned if len(cleaned) >= 10 else None
+
+def _waid_candidate(phone_params, decode):
+    for params in phone_params:
+        for waid_match in WAID_PARAM_RE.finditer(decode(params)):
+            cleaned = _phone_candidate(waid_match.group(1))
+            if cleaned:
+                return cleaned
+    return None
+
+# Files smaller than this are parsed in-process even when parse workers are configured
+PARALLEL_MIN_FILE_SIZE = 16 * 1024 * 1024
+# More ranges than workers keeps all cores busy when cards are unevenly sized
+PARALLEL_RANGES_PER_WORKER = 4
+# Encodings in which BEGIN:VCARD is not plain ASCII bytes; these files are decoded and parsed as text
+WIDE_ENCODINGS = ('utf-16', 'utf-32')
+# Bump whenever _clean_name/_clean_phone_number change so cached parse results are not reused
+NORMALIZATION_VERSION = 4
+
+# Contacts normalized together by _normalize_contacts through normalize_columns
+NORMALIZE_BATCH_SIZE = 50_000
+
+# Runs smaller than this are written in-process even when they are split into several files
+PARALLEL_OUTPUT_MIN_ROWS = 20_000
+
+# Per-process VCFProcessor used by the parse workers, built once by _init_range_worker
+_range_worker = None
+
+def _init_range_worker(titles_to_remove, cleaned_names=(), country_code=DEFAULT_COUNTRY_CODE, area_code=DEFAULT_AREA_CODE):
+    global _range_worker
+    _range_worker = VCFProcessor(os.devnull, titles_to_remove=titles_to_remove, country_code=country_code,
+                                 area_code=area_code)
+    _range_worker.title_matcher.remember(cleaned_names)
+
+def _parse_vcf_range(vcf_file_path, start, end, encoding):
+    _range_worker.parse_stats = {}
+    contacts = list(_range_worker._normalize_contacts(_range_worker._scan_vcf_mmap(vcf_file_path, encoding, start, end)))
+    # Sent back as one list per field, which pickles far faster than one object per contact
+    columns = [[getattr(contact, field) for contact in contacts] for field in CONTACT_FIELDS]
+    return columns, _range_worker.parse_stats.get('skipped_bytes', 0)
+
+def _write_shard(output_format, output_file_path, rows):
+    return OUTPUT_FORMATS[output_format][1](output_file_path, rows)
+
+def _plus_prefixed(number):
+    # +7 991 ... carries its own country code; a + after the first digit is just dropped with the other symbols
+    first = PLUS_OR_DIGIT_RE.search(number)
+    return first is not None and first.group() == '+'
+
+def _digits_only(numbers):
+    """Batch form of the filtering in VCFProcessor._clean_phone_number: one NumPy pass over the numbers joined by NUL
+    bytes. Returns (digit strings, list of whether each number was written with a leading +)."""
+    numbers = [number or '' for number in numbers]
+    if not numbers:
+        return [], []
+    joined = '\x00'.join(numbers)
+    data = np.frombuffer(joined.encode('utf-8'), dtype=np.uint8)
+    separators = data == 0
+    if np.count_nonzero(separators) != len(numbers) - 1:
+        # A NUL inside a number would shift every row after it
+        return [re.sub(r'\D', '', number) for number in numbers], [_plus_prefixed(number) for number in numbers]
+    kept = data[((data >= 48) & (data <= 57)) | (data == 43) | separators]
+    # Each row's first kept byte (the NUL after it when the row has none) tells whether it starts with +
+    starts = np.concatenate([[0], np.flatnonzero(kept == 0) + 1])
+    plus = np.zeros(len(numbers), dtype=bool)
+    inside = starts < len(kept)
+    plus[inside] = kept[starts[inside]] == 43
+    cleaned = kept[kept != 43].tobytes().decode('ascii').split('\x00')
+    plus = plus.tolist()
+    if not joined.isascii():
+        # \D keeps non-ASCII digits too (Arabic-Indic and the like), so those rows are cleaned one by one
+        rows = np.cumsum(separators)
+        for i in np.unique(rows[data >= 0x80]).tolist():
+            cleaned[i], plus[i] = re.sub(r'\D', '', numbers[i]), _plus_prefixed(numbers[i])
+    return cleaned, plus
+
 def read_titles_from_config_ini():
     if getattr(sys, 'frozen', False):
         config_ini_path = os.path.join(sys._MEIPASS, 'config.ini')
@@ -56,118 +223,182 @@ def read_titles_from_config_ini():
         logging.error(f"Error reading config.ini: {e}")
         return []
 
+@lru_cache(maxsize=8)
+def compile_title_matcher(titles):
+    """Built once per title list and shared by every VCFProcessor in the process."""
+    return TitleMatcher(titles)
+
 class VCFProcessor:
-    def __init__(self, log_file_path, titles_to_remove=None):
+    def __init__(self, log_file_path, titles_to_remove=None, parse_workers=1, parse_cache=None,
+                 incremental=False, log_backend='text', bloom_fp_rate=0, country_code=DEFAULT_COUNTRY_CODE,
+                 area_code=DEFAULT_AREA_CODE):
         if not os.path.isabs(log_file_path):
             log_file_path = os.path.abspath(log_file_path)
         self.log_file_path = log_file_path
+        self.checkpoint_file_path = os.path.splitext(log_file_path)[0] + '.checkpoints.json'
         if titles_to_remove is None:
             try:
                 titles_to_remove = read_titles_from_config_ini()
             except Exception as e:
                 logging.warning(f"Could not read titles from config: {e}")
                 titles_to_remove = []
-        if titles_to_remove:
-            self.title_pattern = r'\b(' + '|'.join(re.escape(title) for title in titles_to_remove) + r')\.?\b'
-            self.title_regex = re.compile(self.title_pattern, re.IGNORECASE)
-        else:
-            self.title_regex = None
-        self.processed_numbers_log = self._read_log()
+        self.titles_to_remove = titles_to_remove
+        # 0 or None means one worker per CPU core
+        self.parse_workers = parse_workers
+        self.parse_cache = parse_cache
+        # Append-only sources: resume after the last card seen by a run that was saved to the log
+        self.incremental = incremental
+        self.pending_checkpoint = None
+        self.last_run_id = None
+        # Numbers written without them get these codes, and match the log in E.164 form
+        self.country_code, self.area_code = phone_defaults(country_code, area_code)
+        self.title_matcher = compile_title_matcher(tuple(titles_to_remove))
+        self.titles_version = titles_version(titles_to_remove, NORMALIZATION_VERSION)
+        if parse_cache is not None and not self.title_matcher.memo_loaded:
+            # Once per title list and process; every later processor shares the matcher and its memo
+            self.title_matcher.memo_loaded = True
+            self.title_matcher.remember(parse_cache.get_names(self.titles_version))
+        # Loaded or queried on first lookup, so processors that only parse never touch the log
+        self.processed_log = open_log_store(log_file_path, log_backend, bloom_fp_rate, self.country_code, self.area_code)
+        self.parse_stats = {}
 
-    def _read_vcf(self, vcf_file_path):
+    def _read_prefix(self, vcf_file_path):
+        with open(vcf_file_path, 'rb') as f:
+            return f.read(ENCODING_SNIFF_SIZE)
+
+    def _detect_encoding(self, prefix):
+        for bom, encoding in BYTE_ORDER_MARKS:
+            if prefix.startswith(bom):
+                return encoding
+        
+        declared = None
+        charset_match = CHARSET_PARAM_RE.search(prefix)
+        if charset_match:
+            try:
+                declared = codecs.lookup(charset_match.group(1).decode('ascii')).name
+            except LookupError:
+                logging.warning(f"Ignoring unknown vCard charset: {charset_match.group(1)!r}")
+        
+        if prefix.isascii():
+            return declared or 'utf-8'
         try:
-            if not os.path.isabs(vcf_file_path):
-                vcf_file_path = os.path.abspath(vcf_file_path)
-            
-            if not os.path.exists(vcf_file_path):
-                logging.error(f"VCF file not found: {vcf_file_path}")
-                return None
-            
-            file_size = os.path.getsize(vcf_file_path)
-            logging.info(f"Reading VCF file: {vcf_file_path} (Size: {file_size} bytes)")
-            
-            encodings = ['utf-8', 'utf-8-sig', 'iso-8859-1', 'cp1252', 'latin1']
-            
-            for encoding in encodings:
-                try:
-                    with open(vcf_file_path, 'r', encoding=encoding, errors='replace') as f:
-                        content = f.read()
-                    
-                    if 'BEGIN:VCARD' in content and 'END:VCARD' in content:
-                        logging.info(f"VCF file read successfully with {encoding} encoding. Content length: {len(content)}")
-                        return content
-                    else:
-                        logging.warning(f"Invalid VCF content with {encoding} encoding")
-                        continue
-                        
-                except UnicodeDecodeError as e:
-                    logging.warning(f"Failed to read with {encoding}: {e}")
-                    continue
-                except Exception as e:
-                    logging.error(f"Error reading with {encoding}: {e}")
+            # final=False so a multi-byte sequence cut at the prefix boundary is not an error
+            codecs.getincrementaldecoder('utf-8')().decode(prefix, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            if declared and declared != 'utf-8':
+                return declared
+            return 'cp1252'
+
+    def _open_vcf(self, vcf_file_path, encoding):
+        # newline=None folds \r\n and bare \r into \n while reading, chunk by chunk
+        return open(vcf_file_path, 'r', encoding=encoding, errors='replace', newline=None, buffering=VCF_READ_CHUNK_SIZE)
+
+    def _can_scan_bytes(self, prefix, encoding):
+        # The byte scanner needs ASCII-compatible text with \n line ends; bare-\r files go through _open_vcf
+        return not encoding.startswith(WIDE_ENCODINGS) and (b'\n' in prefix or b'\r' not in prefix)
+
+    def _iter_property_chunks(self, vcf_stream):
+        """Yields the stream in chunks that start with a newline and end on a property boundary."""
+        tail = '\n'
+        while True:
+            chunk = vcf_stream.read(VCF_READ_CHUNK_SIZE)
+            if not chunk:
+                yield tail
+                return
+            buffer = tail + chunk
+            # Cut before the last line that is not a continuation, so no folded value is split
+            cut = buffer.rfind('\n', 0, len(buffer) - 1)
+            while cut >= 0 and buffer[cut + 1] in ' \t':
+                cut = buffer.rfind('\n', 0, cut)
+            if cut < 0:
+                tail = buffer
+                continue
+            yield buffer[:cut]
+            tail = buffer[cut:]
+
+    def _iter_contacts(self, vcf_stream):
+        return self._contacts_from_tokens(
+            CARD_TOKEN_RE.finditer(region) for region in self._iter_property_chunks(vcf_stream))
+
+    def _scan_vcf_mmap(self, vcf_file_path, encoding, start=0, end=None):
+        """Yields the contacts of bytes [start, end) of the file, matched on a read-only memory map.
+
+        The file is never copied into Python memory: only the values of matched properties are decoded.
+        """
+        def decode(value):
+            return _unfold(value.decode(encoding, 'replace'))
+
+        with open(vcf_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if end is None:
+                end = len(mm)
+            # Ranges start on a BEGIN:VCARD line, so the byte before them is the newline tokens anchor on
+            tokens = CARD_TOKEN_BYTES_RE.finditer(mm, max(start - 1, 0), end)
+            if start == 0:
+                # The first line has no newline in front of it, so it is matched on its own
+                first_line = CARD_TOKEN_BYTES_RE.match(b'\n' + mm[:64].removeprefix(codecs.BOM_UTF8))
+                if first_line:
+                    tokens = chain([first_line], tokens)
+            yield from self._contacts_from_tokens([tokens], decode)
+            # The scanner holds a view of the map, which must be released before the map can close
+            del tokens
+
+    def _contacts_from_tokens(self, token_batches, decode=_unfold):
+        """Builds contacts from card token matches, keeping name and phone candidates in priority order.
+
+        decode turns a matched value into unfolded text; values that are never used are never decoded.
+        Binary payloads are only measured by their match span and counted in parse_stats['skipped_bytes'].
+        """
+        block_count, contact_count, skipped_bytes = 0, 0, 0
+        in_card = False
+        for tokens in token_batches:
+            for match in tokens:
+                kind = match.lastindex
+                if kind == TOKEN_BEGIN:
+                    # A BEGIN:VCARD before the previous card's END:VCARD drops that card, as before
+                    in_card = True
+                    names = [None, None, None]  # FN, N, NICKNAME
+                    tel = phone = biz_number = None
+                    phone_params = []
+                elif not in_card:
                     continue
-            
-            try:
-                with open(vcf_file_path, 'rb') as f:
-                    raw_content = f.read()
-                content = raw_content.decode('utf-8', errors='replace')
-                if 'BEGIN:VCARD' in content and 'END:VCARD' in content:
-                    logging.info("VCF file read in binary mode with UTF-8 fallback")
-                    return content
-            except Exception as e:
-                logging.error(f"Binary mode reading failed: {e}")
-            
-            logging.error("Failed to read VCF file with any encoding")
-            return None
-            
-        except Exception as e:
-            logging.error(f"Critical error reading VCF file: {e}", exc_info=True)
-            return None
+                elif kind == TOKEN_END:
+                    in_card = False
+                    block_count += 1
+                    name = names[0] or names[1] or names[2]
+                    if not name:
+                        continue
+                    # waid= only matters when no TEL value qualifies, so it is parsed lazily
+                    number = tel or _waid_candidate(phone_params, decode) or phone or biz_number
+                    if number:
+                        contact_count += 1
+                        yield {'name': name, 'number': number}
+                elif kind == TOKEN_BINARY:
+                    skipped_bytes += match.end() - match.start()
+                elif kind <= TOKEN_NICKNAME:
+                    slot = kind - TOKEN_FN
+                    if names[slot] is None:
+                        names[slot] = decode(match.group(kind)).strip() or None
+                elif tel is None:
+                    value, params = decode(match.group(kind)), match.group(kind - 1)
+                    if params:
+                        phone_params.append(params)
+                    if kind == TOKEN_TEL:
+                        tel = _tel_candidate(value)
+                    elif kind == TOKEN_PHONE:
+                        if phone is None:
+                            phone = _tel_candidate(value)
+                    elif biz_number is None:
+                        biz_match = BIZ_NAME_NUMBER_RE.search(value)
+                        if biz_match:
+                            biz_number = _phone_candidate(biz_match.group(0))
+        self.parse_stats['skipped_bytes'] = self.parse_stats.get('skipped_bytes', 0) + skipped_bytes
+        logging.info(f"Successfully extracted {contact_count} contacts from {block_count} VCF blocks "
+                     f"(skipped {skipped_bytes} bytes of embedded binary data)")
 
     def _extract_contact_data(self, vcf_content):
-        contacts = []
         try:
-            vcf_content = vcf_content.replace('\r\n', '\n').replace('\r', '\n')
-            vcard_blocks = vcf_content.split("BEGIN:VCARD")
-            
-            logging.info(f"Processing {len(vcard_blocks) - 1} VCF blocks")
-            
-            for i, block in enumerate(vcard_blocks):
-                if "END:VCARD" not in block:
-                    continue
-                    
-                name, waid = None, None
-                
-                try:
-                    fn_patterns = [r'FN:(.+?)(?:\n|\r|$)', r'N:([^;\n\r]+)', r'NICKNAME:(.+?)(?:\n|\r|$)']
-                    for pattern in fn_patterns:
-                        fn_match = re.search(pattern, block, re.MULTILINE)
-                        if fn_match:
-                            name = fn_match.group(1).strip()
-                            break
-                    
-                    tel_patterns = [r'TEL[^:]*:([+]?\d[\d\s\-\(\)]+)', r'waid=([^:;\s]+)', r'PHONE[^:]*:([+]?\d[\d\s\-\(\)]+)', r'X-WA-BIZ-NAME[^:]*:.*?([+]?\d{10,15})']
-                    for pattern in tel_patterns:
-                        matches = re.findall(pattern, block, re.MULTILINE | re.IGNORECASE)
-                        if matches:
-                            for match in matches:
-                                cleaned = re.sub(r'[^\d+]', '', match)
-                                if len(cleaned) >= 10:
-                                    waid = cleaned
-                                    break
-                            if waid:
-                                break
-                    
-                    if name and waid:
-                        contacts.append({'name': name, 'number': waid})
-                        
-                except Exception as e:
-                    logging.error(f"Error processing VCF block {i}: {e}")
-                    continue
-            
-            logging.info(f"Successfully extracted {len(contacts)} contacts from VCF")
-            return contacts
-            
+            return list(self._iter_contacts(io.StringIO(vcf_content, newline=None)))
         except Exception as e:
             logging.error(f"Critical error in VCF extraction: {e}", exc_info=True)
             return []
@@ -200,8 +431,8 @@ class VCFProcessor:
                 name = match.group('name2').strip()
                 raw_number = match.group('number2').strip()
                 if name and raw_number:
-                    # Limpa o número exatamente como o código antigo fazia
-                    clean_number = '+' + ''.join(filter(str.isdigit, raw_number))
+                    # Só os dígitos; o + fica apenas quando o número foi escrito com ele (DDI próprio)
+                    clean_number = ('+' if _plus_prefixed(raw_number) else '') + ''.join(filter(str.isdigit, raw_number))
                     contacts.append({'name': name, 'number': clean_number})
 
         logging.info(f"Finished combined text extraction. Found {len(contacts)} potential contacts.")
@@ -209,35 +440,87 @@ class VCFProcessor:
 
     def _clean_name(self, name):
         if not name: return ""
-        ascii_name = unidecode(name)
-        cleaned_name = re.sub(r'[^a-zA-Z0-9\s]+', '', ascii_name)
-        if self.title_regex: cleaned_name = self.title_regex.sub('', cleaned_name)
-        cleaned_name = ' '.join(cleaned_name.split())
-        words = cleaned_name.split()
-        return words[0].title() if words else ""
+        return self.title_matcher.clean_name(name)
+
+    def _save_cleaned_names(self):
+        if self.parse_cache is not None and self.title_matcher.memo_changed:
+            self.title_matcher.memo_changed = False
+            self.parse_cache.put_names(self.titles_version, self.title_matcher.memo_items())
 
     def _clean_phone_number(self, number):
-        return re.sub(r'\D', '', number) if number else ""
+        if not number: return ""
+        return canonical_numbers([re.sub(r'\D', '', number)], self.country_code, self.area_code,
+                                 _plus_prefixed(number))[0]
 
-    def _read_log(self):
-        processed_numbers = set()
-        if os.path.exists(self.log_file_path):
-            try:
-                with open(self.log_file_path, 'r', encoding='utf-8') as f:
-                    processed_numbers.update(line.strip() for line in f)
-                logging.info(f"Loaded {len(processed_numbers)} processed numbers from log.")
-            except Exception as e:
-                logging.error(f"Error reading log file '{self.log_file_path}': {e}")
-        return processed_numbers
+    def number_index(self):
+        return self.processed_log.equivalence_index(self.country_code, self.area_code)
 
     def remove_from_log(self, numbers_to_remove):
-        if not os.path.exists(self.log_file_path) or not numbers_to_remove: return
-        with open(self.log_file_path, 'r', encoding='utf-8') as f: lines = f.readlines()
-        with open(self.log_file_path, 'w', encoding='utf-8') as f:
-            for line in lines:
-                if line.strip() not in numbers_to_remove: f.write(line)
+        if not numbers_to_remove: return
+        # Along with any equivalent forms the numbers were logged in, e.g. without the country code; the numbers
+        # are cleaned ones, so they already carry their country code
+        numbers_to_remove = {int(number) for number in numbers_to_remove} | \
+            self.number_index().logged_forms(numbers_to_remove, international=True)
+        self.processed_log.remove_many(numbers_to_remove)
         logging.info(f"Removed {len(numbers_to_remove)} numbers from the log.")
-        self.processed_numbers_log = self._read_log()
+
+    def _read_checkpoints(self):
+        if not os.path.exists(self.checkpoint_file_path):
+            return {}
+        try:
+            with open(self.checkpoint_file_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            logging.error(f"Error reading checkpoint file '{self.checkpoint_file_path}': {e}")
+            return {}
+
+    def _checkpoint_key(self, vcf_file_path):
+        return os.path.normcase(os.path.abspath(vcf_file_path))
+
+    def _prepare_checkpoint(self, vcf_file_path):
+        """Returns the offset parsing can resume from, and stages the checkpoint for the file as it is now.
+
+        A checkpoint is the offset just past the last END:VCARD line plus a hash of every byte before it;
+        it is only honoured when the file still starts with exactly those bytes.
+        """
+        saved = self._read_checkpoints().get(self._checkpoint_key(vcf_file_path))
+        with open(vcf_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                memoryview(mm) as view:
+            last_end = mm.rfind(b'\nEND:VCARD')
+            if last_end < 0:
+                return 0
+            line_end = mm.find(b'\n', last_end + 1)
+            offset = len(mm) if line_end < 0 else line_end + 1
+            digest = hashlib.blake2b(digest_size=20)
+            resume_offset = 0
+            if saved and 0 < saved.get('offset', 0) <= offset:
+                # One pass over the file: the saved prefix is hashed first, then extended to the new offset
+                digest.update(view[:saved['offset']])
+                if digest.hexdigest() == saved.get('prefix_hash'):
+                    resume_offset = saved['offset']
+                else:
+                    logging.warning(f"VCF file changed before its checkpoint, parsing it in full: {vcf_file_path}")
+                digest.update(view[saved['offset']:offset])
+            else:
+                digest.update(view[:offset])
+        self.pending_checkpoint = (self._checkpoint_key(vcf_file_path),
+                                   {'offset': offset, 'prefix_hash': digest.hexdigest()})
+        return resume_offset
+
+    def _commit_checkpoint(self):
+        if self.pending_checkpoint is None:
+            return
+        key, checkpoint = self.pending_checkpoint
+        try:
+            with file_lock(self.checkpoint_file_path):
+                checkpoints = self._read_checkpoints()
+                checkpoints[key] = checkpoint
+                replace_file(self.checkpoint_file_path,
+                             json.dumps(checkpoints, ensure_ascii=False, indent=2).encode('utf-8'))
+            self.pending_checkpoint = None
+            logging.info(f"Saved checkpoint at byte {checkpoint['offset']} for {key}")
+        except Exception as e:
+            logging.error(f"Error writing checkpoint file '{self.checkpoint_file_path}': {e}")
 
     def _resolve_duplicate_contacts(self, contacts_group):
         if not contacts_group:
@@ -246,53 +529,187 @@ class VCFProcessor:
         if len(contacts_group) > 1:
             max_name_length = 0
             for contact in contacts_group:
-                name_length = len(contact.get('original_name', ''))
+                name_length = len(contact.original_name or '')
                 if name_length > max_name_length:
                     max_name_length = name_length
                     best_contact = contact
         return best_contact
 
+    def normalize_columns(self, names, numbers):
+        """Batch form of _clean_name and _clean_phone_number over two equal-length columns.
+
+        Returns (cleaned names, cleaned numbers) as lists. Numbers are filtered and put in E.164 form in
+        vectorized passes; names are factorized so each distinct name is cleaned once, through the title
+        matcher's memo.
+        """
+        import pandas as pd
+        codes, distinct_names = pd.factorize(pd.Series(names, dtype=object))
+        # Missing names get code -1, which picks the trailing ""
+        cleaned_names = np.array([self._clean_name(name) for name in distinct_names] + [""], dtype=object)
+        digits, plus = _digits_only(numbers)
+        return cleaned_names[codes].tolist(), canonical_numbers(digits, self.country_code, self.area_code, plus)
+
+    def _normalize_contacts(self, extracted_contacts):
+        extracted_contacts = iter(extracted_contacts)
+        while True:
+            batch = list(islice(extracted_contacts, NORMALIZE_BATCH_SIZE))
+            if not batch:
+                return
+            cleaned_names, cleaned_numbers = self.normalize_columns([contact.get('name') for contact in batch],
+                                                                    [contact.get('number') for contact in batch])
+            for contact, cleaned_name, cleaned_number in zip(batch, cleaned_names, cleaned_numbers):
+                if cleaned_number:
+                    name = contact.get('name', '')
+                    # Exports repeat the same names, so equal ones share a single string
+                    yield Contact(sys.intern(name) if type(name) is str else name, contact.get('number', ''),
+                                  cleaned_number, cleaned_name)
+
     def _sort_contacts_by_log(self, extracted_contacts):
-        contacts_by_number = {}
-        for contact in extracted_contacts:
-            cleaned_number = self._clean_phone_number(contact.get('number'))
-            if cleaned_number:
-                contact_data = {
-                    'original_name': contact.get('name', ''),
-                    'original_number': contact.get('number', ''),
-                    'cleaned_number': cleaned_number,
-                    'cleaned_name': self._clean_name(contact.get('name'))
-                }
-                if cleaned_number not in contacts_by_number:
-                    contacts_by_number[cleaned_number] = []
-                contacts_by_number[cleaned_number].append(contact_data)
-        
+        return self._sort_normalized_contacts(self._normalize_contacts(extracted_contacts))
+
+    def _sort_normalized_contacts(self, normalized_contacts):
+        # First contact per number; a group list is only built for numbers that repeat
+        contacts_by_number, repeated = {}, {}
+        for contact in normalized_contacts:
+            first = contacts_by_number.setdefault(contact.cleaned_number, contact)
+            if first is not contact:
+                repeated.setdefault(contact.cleaned_number, [first]).append(contact)
+        # Different numbers can still be the same phone, e.g. a legacy 8-digit mobile and its 9-digit form
+        first_by_key, merged = {}, []
+        numbers = list(contacts_by_number)
+        keys = equivalence_keys(numbers, self.country_code, self.area_code, international=True)
+        for i, (cleaned_number, key) in enumerate(zip(numbers, keys.tolist())):
+            first, j = first_by_key.setdefault(key, (cleaned_number, i))
+            if first != cleaned_number and key >= 0:
+                if cleaned_number == str(key):
+                    # The merged group keeps the canonical form, e.g. the 9-digit mobile, whichever name wins
+                    first, cleaned_number, i, j = cleaned_number, first, j, i
+                    first_by_key[key] = (first, j)
+                group = repeated.setdefault(first, [contacts_by_number[first]])
+                group.extend(repeated.pop(cleaned_number, None) or [contacts_by_number[cleaned_number]])
+                del contacts_by_number[cleaned_number]
+                merged.append(i)
+        del first_by_key
+        if merged:
+            numbers, keys = list(contacts_by_number), np.delete(keys, merged)
+        for cleaned_number, contacts_group in repeated.items():
+            logging.info(f"Found {len(contacts_group)} contacts for number {cleaned_number} in source. Deduplicating.")
+            best_contact = self._resolve_duplicate_contacts(contacts_group)
+            if best_contact.cleaned_number != cleaned_number:
+                best_contact = Contact(best_contact.original_name, best_contact.original_number, cleaned_number,
+                                       best_contact.cleaned_name)
+            contacts_by_number[cleaned_number] = best_contact
+        del repeated
+
+        # Every parse path ends here, once its names have been cleaned
+        self._save_cleaned_names()
         unique_contacts = []
         duplicate_contacts = []
-        
-        for cleaned_number, contacts_group in contacts_by_number.items():
-            if len(contacts_group) > 1:
-                logging.info(f"Found {len(contacts_group)} contacts for number {cleaned_number} in source. Deduplicating.")
-                resolved_contact = self._resolve_duplicate_contacts(contacts_group)
-                if cleaned_number in self.processed_numbers_log:
-                    duplicate_contacts.append(resolved_contact)
-                else:
-                    unique_contacts.append(resolved_contact)
+        # Exact matches, plus numbers logged in an equivalent form through the log's equivalence index
+        logged_numbers = self.processed_log.contains_many(contacts_by_number)
+        logged_numbers |= self.number_index().contains_many(numbers, keys)
+        del numbers, keys
+        for cleaned_number, contact in contacts_by_number.items():
+            if cleaned_number in logged_numbers:
+                duplicate_contacts.append(contact)
             else:
-                contact = contacts_group[0]
-                if cleaned_number in self.processed_numbers_log:
-                    duplicate_contacts.append(contact)
-                else:
-                    unique_contacts.append(contact)
-        
+                unique_contacts.append(contact)
         return unique_contacts, duplicate_contacts
 
-    def get_unique_and_duplicate_contacts(self, vcf_file_path):
-        vcf_content = self._read_vcf(vcf_file_path)
-        if vcf_content is None:
+    def _split_vcf_ranges(self, vcf_file_path, file_size, parts):
+        starts = [0]
+        with open(vcf_file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for i in range(1, parts):
+                # Look from one byte early so a card beginning exactly at the target is found
+                found = mm.find(b'\nBEGIN:VCARD', max(file_size * i // parts, starts[-1] + 1) - 1)
+                if found < 0:
+                    break
+                if found + 1 > starts[-1]:
+                    starts.append(found + 1)
+        return list(zip(starts, starts[1:] + [file_size]))
+
+    def _parse_vcf_parallel(self, vcf_file_path, file_size, encoding, workers):
+        try:
+            ranges = self._split_vcf_ranges(vcf_file_path, file_size, workers * PARALLEL_RANGES_PER_WORKER)
+            if len(ranges) < 2:
+                return None
+            logging.info(f"Parsing {len(ranges)} VCF ranges with {workers} worker processes")
+            starts, ends = zip(*ranges)
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_range_worker,
+                                     initargs=(self.titles_to_remove, self.title_matcher.memo_items(), self.country_code,
+                                               self.area_code)) as executor:
+                # map() yields range results in submission order, so the merge keeps file order
+                normalized_contacts, skipped_bytes = [], 0
+                for columns, range_skipped_bytes in executor.map(
+                        _parse_vcf_range, repeat(vcf_file_path), starts, ends, repeat(encoding)):
+                    contacts = list(map(Contact, *columns))
+                    normalized_contacts.extend(contacts)
+                    skipped_bytes += range_skipped_bytes
+                    # Names the workers cleaned join this process's memo, and the saved one
+                    self.title_matcher.remember((contact.original_name, contact.cleaned_name) for contact in contacts)
+            self.parse_stats['skipped_bytes'] = skipped_bytes
+            return normalized_contacts
+        except Exception as e:
+            logging.error(f"Parallel VCF parsing failed, falling back to a single process: {e}", exc_info=True)
+            return None
+
+    def _parse_normalized_contacts(self, vcf_file_path, file_size, prefix, encoding, workers):
+        if not self._can_scan_bytes(prefix, encoding):
+            with self._open_vcf(vcf_file_path, encoding) as vcf_stream:
+                return list(self._normalize_contacts(self._iter_contacts(vcf_stream)))
+        if workers > 1 and file_size >= PARALLEL_MIN_FILE_SIZE:
+            normalized_contacts = self._parse_vcf_parallel(vcf_file_path, file_size, encoding, workers)
+            if normalized_contacts is not None:
+                return normalized_contacts
+        return self._normalize_contacts(self._scan_vcf_mmap(vcf_file_path, encoding))
+
+    def get_unique_and_duplicate_contacts(self, vcf_file_path, workers=None):
+        if workers is None:
+            workers = self.parse_workers
+        if not workers:
+            workers = os.cpu_count() or 1
+        try:
+            if not os.path.isabs(vcf_file_path):
+                vcf_file_path = os.path.abspath(vcf_file_path)
+            
+            if not os.path.exists(vcf_file_path):
+                logging.error(f"VCF file not found: {vcf_file_path}")
+                return [], []
+            
+            file_size = os.path.getsize(vcf_file_path)
+            prefix = self._read_prefix(vcf_file_path)
+            encoding = self._detect_encoding(prefix)
+            self.parse_stats = {'encoding': encoding}
+            self.pending_checkpoint = None
+            logging.info(f"Reading VCF file: {vcf_file_path} (Size: {file_size} bytes, encoding: {encoding})")
+            if file_size == 0:
+                return [], []
+            
+            if self.incremental and self._can_scan_bytes(prefix, encoding):
+                resume_offset = self._prepare_checkpoint(vcf_file_path)
+                if resume_offset:
+                    logging.info(f"Resuming VCF file from checkpoint at byte {resume_offset} of {file_size}")
+                    self.parse_stats['resumed_from'] = resume_offset
+                    return self._sort_contacts_by_log(self._scan_vcf_mmap(vcf_file_path, encoding, start=resume_offset))
+
+            cache_key = None
+            if self.parse_cache is not None:
+                cache_key = self.parse_cache.key_for(vcf_file_path, titles_version(
+                    self.titles_to_remove, [NORMALIZATION_VERSION, self.country_code, self.area_code]))
+                cached = self.parse_cache.get(cache_key)
+                if cached is not None:
+                    normalized_contacts, cached_stats = cached
+                    self.parse_stats = {**cached_stats, 'cache_hit': True}
+                    return self._sort_normalized_contacts(normalized_contacts)
+
+            normalized_contacts = self._parse_normalized_contacts(vcf_file_path, file_size, prefix, encoding, workers)
+            if cache_key is not None:
+                normalized_contacts = list(normalized_contacts)
+                self.parse_cache.put(cache_key, normalized_contacts, self.parse_stats)
+            return self._sort_normalized_contacts(normalized_contacts)
+        except Exception as e:
+            logging.error(f"Critical error reading VCF file: {e}", exc_info=True)
             return [], []
-        extracted_contacts = self._extract_contact_data(vcf_content)
-        return self._sort_contacts_by_log(extracted_contacts)
 
     def get_unique_and_duplicate_contacts_from_text(self, text_content):
         if not text_content or not text_content.strip():
@@ -300,47 +717,93 @@ class VCFProcessor:
         extracted_contacts = self._extract_contacts_from_text(text_content)
         return self._sort_contacts_by_log(extracted_contacts)
 
-    def process_and_save(self, contacts_to_process, output_dir, base_name):
+    def _output_rows(self, contacts):
+        # Rows are produced while the sheet is written, so no row list is ever built
+        for contact in contacts:
+            if contact.cleaned_number:
+                # Contacts from the parse already carry their cleaned name
+                yield int(contact.cleaned_number), (contact.cleaned_name if contact.cleaned_name is not None
+                                                    else self._clean_name(contact.original_name))
+
+    def _write_shards(self, contacts, transaction, output_dir, base_name, output_format, max_rows_per_file, bundle):
+        """Writes base_part001... files of at most max_rows_per_file rows plus a JSON manifest of their row ranges.
+
+        Returns the manifest path (or the zip holding the shards and the manifest when bundle is set) and the row count.
+        """
+        extension, write_output = OUTPUT_FORMATS[output_format]
+        contacts = [contact for contact in contacts if contact.cleaned_number]
+        shards = [contacts[i:i + max_rows_per_file] for i in range(0, len(contacts), max_rows_per_file)]
+        digits = max(3, len(str(len(shards))))
+        def file_names_for(base):
+            return [f"{base}_part{i:0{digits}d}{extension}" for i in range(1, len(shards) + 1)] + \
+                   [f"{base}_manifest.json"] + ([f"{base}.zip"] if bundle else [])
+        base = transaction.reserve(output_dir, base_name, file_names_for)
+        shard_names, manifest_name = file_names_for(base)[:len(shards)], f"{base}_manifest.json"
+        # Everything is written under temp names; transaction.publish() moves it into place
+        shard_paths = [transaction.temp_path(os.path.join(output_dir, name)) for name in shard_names]
+        workers = min(self.parse_workers or os.cpu_count() or 1, len(shards))
+        logging.info(f"Saving {len(contacts)} rows as {len(shards)} {output_format} files of up to {max_rows_per_file} rows")
+        if output_format in PARALLEL_OUTPUT_FORMATS and workers > 1 and len(contacts) >= PARALLEL_OUTPUT_MIN_ROWS:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                shard_rows = [list(self._output_rows(shard)) for shard in shards]
+                rows_written = list(executor.map(_write_shard, repeat(output_format), shard_paths, shard_rows))
+        else:
+            rows_written = [write_output(path, self._output_rows(shard)) for path, shard in zip(shard_paths, shards)]
+        manifest, first_row = [], 1
+        for name, shard, rows in zip(shard_names, shards, rows_written):
+            manifest.append({'file': name, 'rows': rows, 'first_row': first_row, 'last_row': first_row + rows - 1,
+                             'first_number': int(shard[0].cleaned_number),
+                             'last_number': int(shard[-1].cleaned_number)})
+            first_row += rows
+        manifest_path = os.path.join(output_dir, manifest_name)
+        with open(transaction.temp_path(manifest_path), 'w', encoding='utf-8') as f:
+            json.dump({'run_id': transaction.intent['run_id'], 'format': output_format,
+                       'max_rows_per_file': max_rows_per_file, 'total_rows': first_row - 1, 'shards': manifest},
+                      f, ensure_ascii=False, indent=2)
+        if bundle:
+            zip_path = os.path.join(output_dir, f"{base}.zip")
+            bundle_files(transaction.temp_path(zip_path), shard_paths + [transaction.temp_path(manifest_path)],
+                         shard_names + [manifest_name])
+            return zip_path, first_row - 1
+        return manifest_path, first_row - 1
+
+    def process_and_save(self, contacts_to_process, output_dir, base_name, source=None, output_format=DEFAULT_OUTPUT_FORMAT,
+                         max_rows_per_file=0, bundle=False):
+        """Writes the output and logs its numbers as one transaction; runs over max_rows_per_file rows (when set)
+        are split into parts. The numbers are only logged once the output files are in place."""
         if not contacts_to_process: return None
-        output_data, newly_processed_numbers = [], set()
-        for contact in contacts_to_process:
-            cleaned_number = contact['cleaned_number']
-            cleaned_name = self._clean_name(contact['original_name'])
-            if cleaned_number:
-                output_data.append({'Number': int(cleaned_number), 'Name': cleaned_name})
-                newly_processed_numbers.add(cleaned_number)
-        if not output_data: return None
-        
-        try:
-            with open(self.log_file_path, 'a', encoding='utf-8') as f:
-                for number in newly_processed_numbers: f.write(f"{number}\n")
-            logging.info(f"Appended {len(newly_processed_numbers)} numbers to log.")
-        except Exception as e:
-            logging.error(f"Error writing to log file: {e}")
+        format_error = output_format_error(output_format)
+        if format_error:
+            logging.error(format_error)
+            return None
+        extension, write_output = OUTPUT_FORMATS[output_format]
+        newly_processed_numbers = {contact.cleaned_number for contact in contacts_to_process
+                                   if contact.cleaned_number}
+        if not newly_processed_numbers: return None
 
-        output_df = pd.DataFrame(output_data)
-        
+        self.last_run_id = None
+        run_id = new_run_id()
         try:
-            # Logic is now simple and direct, no more guessing
             os.makedirs(output_dir, exist_ok=True)
-            output_file_path = os.path.join(output_dir, f"{base_name}.xlsx")
-            
-            counter = 1
-            while os.path.exists(output_file_path):
-                output_file_path = os.path.join(output_dir, f"{base_name}_{counter}.xlsx")
-                counter += 1
-            
-            logging.info(f"Saving Excel file to: {output_file_path}")
-            
-            output_df.to_excel(output_file_path, index=False, engine='openpyxl')
-            
-            if os.path.exists(output_file_path):
-                file_size = os.path.getsize(output_file_path)
-                logging.info(f"Excel file created successfully: {output_file_path} ({file_size} bytes)")
-                return output_file_path
-            else:
-                logging.error(f"Failed to create Excel file: {output_file_path}")
-                return None
+            with OutputTransaction(self.processed_log, run_id, source=source, canonical=True) as transaction:
+                if max_rows_per_file and max_rows_per_file > 0 and len(newly_processed_numbers) > max_rows_per_file:
+                    output_file_path, rows_written = self._write_shards(contacts_to_process, transaction, output_dir,
+                                                                        base_name, output_format, max_rows_per_file,
+                                                                        bundle)
+                else:
+                    base = transaction.reserve(output_dir, base_name, lambda base: [f"{base}{extension}"])
+                    output_file_path = os.path.join(output_dir, base + extension)
+                    logging.info(f"Saving {output_format} file to: {output_file_path}")
+                    rows_written = write_output(transaction.temp_path(output_file_path),
+                                                self._output_rows(contacts_to_process))
+                transaction.publish()
+                logging.info(f"Output file created successfully: {output_file_path} ({rows_written} rows, "
+                             f"{os.path.getsize(output_file_path)} bytes)")
+                if transaction.commit(newly_processed_numbers, output_file_path):
+                    self.last_run_id = run_id
+                    logging.info(f"Appended {len(newly_processed_numbers)} numbers to log.")
+                    self._commit_checkpoint()
+            return output_file_path
         except Exception as e:
-            logging.error(f"Error saving Excel file: {e}", exc_info=True)
+            logging.error(f"Error saving output file: {e}", exc_info=True)
             return None
\ No newline at end of file